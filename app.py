@@ -1,24 +1,150 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify
+from flask import (Flask, render_template, redirect, url_for, flash, request, jsonify, abort, Response,
+                   stream_with_context, session, g, has_request_context)
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.http import is_resource_modified
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 import os
+import sys
 import subprocess
+import socket
+import csv
+import gzip
+from array import array
 import json
-from datetime import datetime
+import click
+import queue
+import threading
+import time
+import math
+import hashlib
+import mmap
+import multiprocessing
+import struct
+from bisect import bisect_left, bisect_right
+import itertools
+import functools
+import contextlib
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+
+from quiz_engine import COURSE_QUESTIONS, quiz_rng, sample_ids, stratified_sample
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.urandom(24)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///learning_platform.db'
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or os.urandom(24)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///learning_platform.db')
+
+# Database profiles: pragmas applied to every new SQLite connection plus pool settings
+DATABASE_PROFILES = {
+    'sqlite-default': {
+        'pragmas': {},
+        'engine_options': {}
+    },
+    'sqlite-wal': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 268435456
+        },
+        'engine_options': {
+            'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW', 20))
+        }
+    },
+    'server': {
+        'pragmas': {},
+        'engine_options': {
+            'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW', 20)),
+            'pool_pre_ping': True,
+            'pool_recycle': 1800
+        }
+    }
+}
+app.config['DATABASE_PROFILE'] = os.environ.get(
+    'DATABASE_PROFILE',
+    'sqlite-wal' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite') else 'server'
+)
+database_profile = DATABASE_PROFILES[app.config['DATABASE_PROFILE']]
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_profile['engine_options']
+app.config['HISTORY_PAGE_SIZE'] = 20
+app.config['PASS_PERCENTAGE'] = int(os.environ.get('PASS_PERCENTAGE', 60))
+# Group-commit /submit_grade through GradeWriter. Only worth it when a worker serves requests
+# concurrently (gthread or gevent); a sync worker never has more than one grade to batch.
+app.config['GRADE_WRITE_BEHIND'] = os.environ.get('GRADE_WRITE_BEHIND', '0') == '1'
+app.config['GRADE_FLUSH_SIZE'] = int(os.environ.get('GRADE_FLUSH_SIZE', 200))
+app.config['GRADE_FLUSH_TIMEOUT'] = 10
+app.config['QUIZ_HOST_PORT'] = int(os.environ.get('QUIZ_HOST_PORT', 5055))
+app.config['QUESTION_CACHE_SIZE'] = int(os.environ.get('QUESTION_CACHE_SIZE', 5000))
+app.config['GRADE_TOKEN_MAX_AGE'] = 7 * 24 * 3600
+app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 10000))
+app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 300))
+# Rendered dashboard and course pages: 'local' (per-process LRU) or 'redis' (shared, needs the redis package)
+app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'local')
+app.config['PAGE_CACHE_URL'] = os.environ.get('PAGE_CACHE_URL', 'redis://localhost:6379/0')
+app.config['PAGE_CACHE_USERS'] = int(os.environ.get('PAGE_CACHE_USERS', 10000))
+app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', 3600))
+# Bump to invalidate every cached page and browser copy after a template change
+app.config['PAGE_CACHE_VERSION'] = os.environ.get('PAGE_CACHE_VERSION', '1')
+app.config['METRICS_LATENCY_BUCKETS'] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+app.config['METRICS_QUERY_BUCKETS'] = (0, 1, 2, 5, 10, 20, 50, 100)
+# Requests taking at least this many seconds get their sampled stacks written to PROFILE_DIR; 0 turns the profiler off
+app.config['PROFILE_SLOW_REQUESTS'] = float(os.environ.get('PROFILE_SLOW_REQUESTS', 0))
+app.config['PROFILE_INTERVAL'] = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+# Seconds between leaderboard catch-ups with grades recorded by other workers
+app.config['LEADERBOARD_REFRESH'] = float(os.environ.get('LEADERBOARD_REFRESH', 2))
+app.config['LEADERBOARD_PAGE_SIZE'] = 20
+# Live grade feed: events held per subscriber, seconds between polls for new grades, keepalive period
+app.config['FEED_BUFFER_SIZE'] = int(os.environ.get('FEED_BUFFER_SIZE', 100))
+app.config['FEED_POLL_INTERVAL'] = float(os.environ.get('FEED_POLL_INTERVAL', 1))
+app.config['FEED_KEEPALIVE'] = 15
+# Usernames allowed to watch the live grade feed, e.g. PROCTORS=alice,bob
+app.config['PROCTORS'] = {name.strip() for name in os.environ.get('PROCTORS', '').split(',') if name.strip()}
+# Closed terms are moved out of quiz_grade into one SQLite file each under ARCHIVE_DIR
+app.config['ARCHIVE_DIR'] = os.environ.get('ARCHIVE_DIR', os.path.join(app.instance_path, 'archive'))
+app.config['TERM_MONTHS'] = int(os.environ.get('TERM_MONTHS', 6))
+# Werkzeug method string, e.g. 'scrypt' or 'pbkdf2:sha256:600000'; short forms take Werkzeug's default cost
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+# Hashing processes per gunicorn worker (0 hashes in the request thread). Each worker has its
+# own pool, so a host hashes up to workers x PASSWORD_HASH_WORKERS passwords at once.
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+# Admission control for POSTs to these endpoints: requests in flight across all workers on the host,
+# plus token buckets as (requests per second, burst) per client IP and per user. Over the limit is a 429.
+app.config['ADMISSION_CONTROL'] = os.environ.get('ADMISSION_CONTROL', '1') == '1'
+app.config['ADMISSION_FILE'] = os.environ.get('ADMISSION_FILE', os.path.join(app.instance_path, 'admission.bin'))
+app.config['ADMISSION_BUCKETS'] = 65536
+app.config['ADMISSION_LIMITS'] = {
+    'login': {'concurrency': 4 * (os.cpu_count() or 1), 'ip': (20, 200), 'user': (1, 5)},
+    'register': {'concurrency': 2 * (os.cpu_count() or 1), 'ip': (2, 50)},
+    'submit_grade': {'concurrency': 64, 'ip': (100, 1000), 'user': (2, 30)},
+    'submit_grades': {'concurrency': 16, 'ip': (20, 200), 'user': (1, 10)}
+}
 db = SQLAlchemy(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+with app.app_context():
+    @event.listens_for(db.engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in database_profile['pragmas'].items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     progress = db.Column(db.Integer, default=0)
     quiz_grades = db.relationship('QuizGrade', backref='user', lazy=True)
 
@@ -29,10 +155,1743 @@ class QuizGrade(db.Model):
     score = db.Column(db.Integer, nullable=False)
     total_questions = db.Column(db.Integer, nullable=False)
     date_taken = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Set by the quiz app's spool so a grade re-sent after a lost response is recorded once
+    client_id = db.Column(db.String(64))
+
+    __table_args__ = (
+        db.Index('ix_quiz_grade_user_course_date', 'user_id', 'course', 'date_taken'),
+        db.Index('ix_quiz_grade_user_client_id', 'user_id', 'client_id', unique=True),
+    )
+
+    responses = db.relationship('QuestionResponse', backref='grade', lazy=True)
+
+    @property
+    def percentage(self):
+        return self.score / self.total_questions * 100 if self.total_questions else 0
+
+class QuestionResponse(db.Model):
+    # One narrow row per question answered in an attempt, appended with its grade
+    grade_id = db.Column(db.Integer, db.ForeignKey('quiz_grade.id'), primary_key=True)
+    question_id = db.Column(db.Integer, primary_key=True)
+    chosen = db.Column(db.SmallInteger)
+    correct = db.Column(db.Boolean, nullable=False)
+    time_ms = db.Column(db.Integer, nullable=False, default=0)
+
+class CourseSummary(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    course = db.Column(db.String(20), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    best_score = db.Column(db.Integer, nullable=False, default=0)
+    latest_score = db.Column(db.Integer, nullable=False, default=0)
+    latest_total_questions = db.Column(db.Integer, nullable=False, default=0)
+    average_percentage = db.Column(db.Float, nullable=False, default=0)
+    last_taken = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_course_summary_course_last_taken', 'course', 'last_taken'),
+    )
+
+    def record(self, grade):
+        # Fold one new attempt into the running aggregates
+        self.attempts = (self.attempts or 0) + 1
+        self.best_score = max(self.best_score or 0, grade.score)
+        self.average_percentage = (self.average_percentage or 0) + (grade.percentage - (self.average_percentage or 0)) / self.attempts
+        if self.last_taken is None or grade.date_taken >= self.last_taken:
+            self.latest_score = grade.score
+            self.latest_total_questions = grade.total_questions
+            self.last_taken = grade.date_taken
+
+class ScoreBucket(db.Model):
+    # Attempts per course at each whole percentage, the basis of the cohort analytics
+    course = db.Column(db.String(20), primary_key=True)
+    percentage = db.Column(db.Integer, primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+def score_bucket(score, total_questions):
+    return score * 100 // total_questions if total_questions else 0
+
+class GradeArchive(db.Model):
+    # A closed term whose grades were moved to their own database
+    term = db.Column(db.String(20), primary_key=True)
+    path = db.Column(db.String(255), nullable=False)
+    starts = db.Column(db.DateTime, nullable=False)
+    ends = db.Column(db.DateTime, nullable=False)
+    grades = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Question(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    course = db.Column(db.String(20), nullable=False, index=True)
+    text = db.Column(db.Text, nullable=False)
+    topic = db.Column(db.String(80))
+    difficulty = db.Column(db.Integer)
+    options = db.relationship('Option', backref='question', lazy='selectin',
+                              order_by='Option.position', cascade='all, delete-orphan')
+
+    def to_dict(self):
+        # Same shape as the entries in COURSE_QUESTIONS
+        return {
+            'id': self.id,
+            'question': self.text,
+            'options': [option.text for option in self.options],
+            'correct': next((i for i, option in enumerate(self.options) if option.is_correct), None),
+            'topic': self.topic,
+            'difficulty': self.difficulty
+        }
+
+class Option(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    is_correct = db.Column(db.Boolean, nullable=False, default=False)
+
+class QuestionBank(db.Model):
+    # Bumped on every edit so caches in other processes notice
+    course = db.Column(db.String(20), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def latest_grades_query(*criteria):
+    # Latest grade per (user, course), served from the composite index
+    ranked = db.select(
+        QuizGrade.id,
+        db.func.row_number().over(
+            partition_by=(QuizGrade.user_id, QuizGrade.course),
+            order_by=(QuizGrade.date_taken.desc(), QuizGrade.id.desc())
+        ).label('rank')
+    ).where(*criteria).subquery()
+    return db.select(QuizGrade).join(ranked, QuizGrade.id == ranked.c.id).where(ranked.c.rank == 1)
+
+def course_summaries(user_id):
+    return {summary.course: summary for summary in CourseSummary.query.filter_by(user_id=user_id)}
+
+def history_query(user_id, course, cursor=None):
+    # Newest first, keyed on (date_taken, id) so pages never skip or repeat rows
+    query = db.select(QuizGrade).where(
+        QuizGrade.user_id == user_id, QuizGrade.course == course
+    ).order_by(QuizGrade.date_taken.desc(), QuizGrade.id.desc())
+    if cursor is not None:
+        query = query.where(db.tuple_(QuizGrade.date_taken, QuizGrade.id) < cursor)
+    return query
+
+def archived_history(user_id, course, cursor, limit):
+    # Older attempts from term archives, newest first, continuing from cursor
+    grades = []
+    archives = GradeArchive.query.order_by(GradeArchive.starts.desc())
+    if cursor is not None:
+        archives = archives.filter(GradeArchive.starts <= cursor[0])
+    for archive in archives:
+        if len(grades) >= limit:
+            break
+        with Session(archive_engine(archive.path)) as archive_session:
+            grades.extend(archive_session.scalars(history_query(user_id, course, cursor).limit(limit - len(grades))))
+    return grades
+
+def iter_archived_history(user_id, course):
+    for archive in GradeArchive.query.order_by(GradeArchive.starts.desc()):
+        with Session(archive_engine(archive.path)) as archive_session:
+            yield from archive_session.scalars(history_query(user_id, course).execution_options(yield_per=500))
+
+def encode_cursor(grade):
+    return f'{grade.date_taken.isoformat()}_{grade.id}'
+
+def decode_cursor(value):
+    try:
+        date_taken, grade_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(date_taken), int(grade_id)
+    except ValueError:
+        abort(400)
+
+def history_page(user_id, course, cursor, page_size):
+    # One page of live grades, carrying on into archived terms, and the cursor for the next page
+    grades = db.session.scalars(history_query(user_id, course, cursor).limit(page_size + 1)).all()
+    if len(grades) <= page_size:
+        # Ran past the live table; carry on into archived terms
+        archive_cursor = (grades[-1].date_taken, grades[-1].id) if grades else cursor
+        grades += archived_history(user_id, course, archive_cursor, page_size + 1 - len(grades))
+    next_cursor = encode_cursor(grades[page_size - 1]) if len(grades) > page_size else None
+    return grades[:page_size], next_cursor
+
+def known_course(course):
+    # The built-in courses and any with an imported question bank; per-course caches only hold these
+    return course in COURSE_QUESTIONS or db.session.get(QuestionBank, course) is not None
+
+def course_for_id(course_id):
+    return 'python' if course_id == 1 else 'database' if course_id == 2 else 'web'
+
+def record_grade(grade):
+    # Add the grade and update its summary row in the caller's transaction
+    if grade.date_taken is None:
+        grade.date_taken = datetime.utcnow()
+    db.session.add(grade)
+    summary = db.session.get(CourseSummary, (grade.user_id, grade.course))
+    if summary is None:
+        summary = CourseSummary(user_id=grade.user_id, course=grade.course)
+        db.session.add(summary)
+    summary.record(grade)
+    # Every student of a course shares these rows, so increment in SQL rather than read-modify-write,
+    # as one upsert so that two first attempts at a bucket on a server database cannot both insert
+    insert = postgresql_insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+    db.session.execute(
+        insert(ScoreBucket)
+        .values(course=grade.course, percentage=score_bucket(grade.score, grade.total_questions), attempts=1)
+        .on_conflict_do_update(
+            index_elements=[ScoreBucket.course, ScoreBucket.percentage],
+            set_={'attempts': ScoreBucket.attempts + 1}
+        )
+    )
+    return summary
+
+class GradeWriter:
+    """Write-behind queue that commits concurrent grade submissions together.
+
+    Each flush takes whatever is pending, up to GRADE_FLUSH_SIZE grades,
+    and commits it in a single transaction without waiting for more:
+    grades that arrive while one flush commits form the next batch.
+    Callers wait on the returned future so a success response still means
+    the grade is on disk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.committed = 0
+        self.flushes = 0
+
+    def submit(self, values):
+        future = Future()
+        self.pending.put((values, future))
+        self._ensure_started()
+        return future
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own thread
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='grade-writer', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < self.app.config['GRADE_FLUSH_SIZE']:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self.app.app_context():
+            try:
+                summaries = [record_grade(build_grade(values)) for values, _ in batch]
+                best_scores = best_scores_of(summaries)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                if len(batch) == 1:
+                    values, future = batch[0]
+                    if isinstance(e, IntegrityError) and not unrecorded([values]):
+                        # A retry whose original committed first (perhaps earlier in this batch)
+                        future.set_result(None)
+                    else:
+                        future.set_exception(e)
+                    return
+                # Commit the grades one at a time so only the one that failed is refused
+                for item in batch:
+                    self._flush([item])
+                return
+        leaderboards.record(best_scores)
+        grade_feed.notify()
+        self.committed += len(batch)
+        self.flushes += 1
+        for _, future in batch:
+            future.set_result(None)
+
+grade_writer = GradeWriter(app)
+
+def best_scores_of(summaries):
+    # Read before commit expires them
+    return {(summary.user_id, summary.course): summary.best_score for summary in summaries}
+
+def is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+def grade_values(user_id, data):
+    # Rejected with a 400 here, a malformed grade never reaches a batch shared with other students
+    if not isinstance(data, dict):
+        abort(400)
+    course, score, total_questions = data.get('course'), data.get('score'), data.get('total_questions')
+    if not isinstance(course, str) or not 0 < len(course) <= 20:
+        abort(400)
+    if not is_count(score) or not is_count(total_questions) or not score <= total_questions or not total_questions:
+        abort(400)
+    responses = data.get('responses', [])
+    if not isinstance(responses, list) or not all(isinstance(response, dict) for response in responses):
+        abort(400)
+    try:
+        responses = [
+            {
+                'question_id': int(response['question_id']),
+                'chosen': None if response.get('chosen') is None else int(response['chosen']),
+                'correct': bool(response['correct']),
+                'time_ms': max(int(response.get('time_ms', 0)), 0)
+            }
+            for response in responses
+        ]
+    except (KeyError, TypeError, ValueError):
+        abort(400)
+    if len({response['question_id'] for response in responses}) != len(responses):
+        abort(400)
+    client_id = data.get('client_id')
+    if client_id is not None and (not isinstance(client_id, str) or not 0 < len(client_id) <= 64):
+        abort(400)
+    return {
+        'user_id': user_id,
+        'course': course,
+        'score': score,
+        'total_questions': total_questions,
+        'date_taken': datetime.utcnow(),
+        'client_id': client_id,
+        'responses': responses
+    }
+
+def unrecorded(grades):
+    # Drops grades whose client_id the student already stored (or repeated in this batch): a retry after a lost response
+    keys = {(values['user_id'], values['client_id']) for values in grades if values['client_id'] is not None}
+    if not keys:
+        return grades
+    seen = {
+        (user_id, client_id)
+        for user_id, client_id in db.session.execute(
+            db.select(QuizGrade.user_id, QuizGrade.client_id).where(
+                QuizGrade.user_id.in_({user_id for user_id, _ in keys}),
+                QuizGrade.client_id.in_({client_id for _, client_id in keys})
+            )
+        )
+    }
+    fresh = []
+    for values in grades:
+        if values['client_id'] is not None:
+            key = (values['user_id'], values['client_id'])
+            if key in seen:
+                continue
+            seen.add(key)
+        fresh.append(values)
+    return fresh
+
+def commit_grades(grades):
+    best_scores = best_scores_of([record_grade(build_grade(values)) for values in grades])
+    db.session.commit()
+    return best_scores
+
+def build_grade(values):
+    values = dict(values)
+    responses = values.pop('responses', ())
+    grade = QuizGrade(**values)
+    grade.responses = [QuestionResponse(**response) for response in responses]
+    return grade
+
+def grade_sources():
+    # The live quiz_grade table, then each archived term's copy, newest first
+    yield db.session
+    for archive in GradeArchive.query.order_by(GradeArchive.starts.desc()).all():
+        with Session(archive_engine(archive.path)) as archive_session:
+            yield archive_session
+
+def rebuild_course_summaries(batch_size=1000):
+    # Backfill summaries from quiz_grade and the term archives, one batch of users at a time
+    CourseSummary.query.delete()
+    last_user_id = 0
+    while True:
+        user_ids = db.session.scalars(
+            db.select(User.id).where(User.id > last_user_id).order_by(User.id).limit(batch_size)
+        ).all()
+        if not user_ids:
+            break
+        in_batch = QuizGrade.user_id.between(user_ids[0], user_ids[-1])
+        percentage = QuizGrade.score * 100.0 / db.func.nullif(QuizGrade.total_questions, 0)
+        summaries = {}
+        for source in grade_sources():
+            totals = source.execute(
+                db.select(
+                    QuizGrade.user_id,
+                    QuizGrade.course,
+                    db.func.count(),
+                    db.func.max(QuizGrade.score),
+                    db.func.sum(db.func.coalesce(percentage, 0))
+                ).where(in_batch).group_by(QuizGrade.user_id, QuizGrade.course)
+            )
+            for user_id, course, attempts, best_score, total_percentage in totals:
+                summary = summaries.get((user_id, course))
+                if summary is None:
+                    summaries[(user_id, course)] = {
+                        'user_id': user_id,
+                        'course': course,
+                        'attempts': attempts,
+                        'best_score': best_score,
+                        'average_percentage': total_percentage
+                    }
+                else:
+                    summary['attempts'] += attempts
+                    summary['best_score'] = max(summary['best_score'], best_score)
+                    summary['average_percentage'] += total_percentage
+            for grade in source.scalars(latest_grades_query(in_batch)):
+                summary = summaries[(grade.user_id, grade.course)]
+                # Sources come newest first, so the first latest grade found wins
+                if 'last_taken' not in summary:
+                    summary.update(
+                        latest_score=grade.score,
+                        latest_total_questions=grade.total_questions,
+                        last_taken=grade.date_taken
+                    )
+        for summary in summaries.values():
+            summary['average_percentage'] /= summary['attempts']
+        if summaries:
+            db.session.execute(db.insert(CourseSummary), list(summaries.values()))
+        db.session.commit()
+        last_user_id = user_ids[-1]
+
+def rebuild_score_buckets():
+    # Backfill the analytics histogram with one grouped scan of quiz_grade and of each term archive
+    ScoreBucket.query.delete()
+    percentage = db.func.coalesce(QuizGrade.score * 100 // db.func.nullif(QuizGrade.total_questions, 0), 0)
+    counts = Counter()
+    for source in grade_sources():
+        buckets = source.execute(
+            db.select(QuizGrade.course, percentage, db.func.count()).group_by(QuizGrade.course, percentage)
+        )
+        for course, bucket, attempts in buckets:
+            counts[(course, bucket)] += attempts
+    rows = [
+        {'course': course, 'percentage': bucket, 'attempts': attempts}
+        for (course, bucket), attempts in counts.items()
+    ]
+    if rows:
+        db.session.execute(db.insert(ScoreBucket), rows)
+    db.session.commit()
+
+def histogram_percentile(counts, total, p):
+    # Nearest-rank percentile over attempts per whole percentage
+    rank = max(1, math.ceil(p / 100 * total))
+    seen = 0
+    for percentage, attempts in enumerate(counts):
+        seen += attempts
+        if seen >= rank:
+            return percentage
+
+def course_analytics(course, bin_width=10):
+    # Cohort statistics from the course's score buckets, never from quiz_grade itself
+    counts = [0] * 101
+    buckets = db.session.execute(
+        db.select(ScoreBucket.percentage, ScoreBucket.attempts).where(ScoreBucket.course == course)
+    )
+    for percentage, attempts in buckets:
+        counts[min(max(percentage, 0), 100)] += attempts
+    total = sum(counts)
+    pass_percentage = app.config['PASS_PERCENTAGE']
+    passed = sum(counts[pass_percentage:])
+    histogram = []
+    for start in range(0, 100, bin_width):
+        # The last bin also holds perfect scores
+        end = start + bin_width if start + bin_width < 100 else 101
+        histogram.append({'from': start, 'to': end - 1, 'attempts': sum(counts[start:end])})
+    return {
+        'course': course,
+        'attempts': total,
+        'pass_percentage': pass_percentage,
+        'passed': passed,
+        'pass_rate': passed / total if total else None,
+        'percentiles': {
+            f'p{p}': histogram_percentile(counts, total, p) if total else None
+            for p in (10, 25, 50, 75, 90)
+        },
+        'histogram': histogram
+    }
+
+class ItemStatistics:
+    """Running sums for one question, enough for its classical item statistics.
+
+    Discrimination is the point-biserial correlation between answering the
+    question correctly and the rest of the attempt's score (the score
+    without this question), so an item is not correlated with itself.
+    """
+
+    __slots__ = ('responses', 'correct', 'time_ms', 'rest', 'rest_squared', 'correct_rest')
+
+    def __init__(self):
+        self.responses = 0
+        self.correct = 0
+        self.time_ms = 0
+        self.rest = 0.0
+        self.rest_squared = 0.0
+        self.correct_rest = 0.0
+
+    def add(self, correct, time_ms, rest):
+        self.responses += 1
+        self.correct += correct
+        self.time_ms += time_ms
+        self.rest += rest
+        self.rest_squared += rest * rest
+        self.correct_rest += correct * rest
+
+    @property
+    def difficulty(self):
+        # Proportion answering correctly, the classical p-value
+        return self.correct / self.responses
+
+    @property
+    def discrimination(self):
+        n = self.responses
+        p = self.difficulty
+        rest_mean = self.rest / n
+        rest_variance = self.rest_squared / n - rest_mean ** 2
+        if p in (0, 1) or rest_variance <= 1e-12:
+            return None
+        covariance = self.correct_rest / n - p * rest_mean
+        return covariance / math.sqrt(p * (1 - p) * rest_variance)
+
+    @property
+    def mean_time_ms(self):
+        return self.time_ms / self.responses
+
+def item_analysis(batch_size=10000):
+    # One streaming pass over question_response; memory grows with the number of questions only
+    items = {}
+    responses = db.select(
+        QuestionResponse.question_id,
+        QuestionResponse.correct,
+        QuestionResponse.time_ms,
+        QuizGrade.score,
+        QuizGrade.total_questions
+    ).join(QuizGrade, QuizGrade.id == QuestionResponse.grade_id).execution_options(yield_per=batch_size)
+    for question_id, correct, time_ms, score, total_questions in db.session.execute(responses):
+        correct = int(correct)
+        rest = (score - correct) / (total_questions - 1) if total_questions > 1 else 0.0
+        item = items.get(question_id)
+        if item is None:
+            item = items[question_id] = ItemStatistics()
+        item.add(correct, time_ms, rest)
+    return items
+
+GRADE_EXPORT_COLUMNS = ('id', 'user_id', 'course', 'score', 'total_questions', 'date_taken')
+
+def open_export(path):
+    # '-' for standard output; a .gz suffix compresses
+    if path == '-':
+        return contextlib.nullcontext(click.get_text_stream('stdout'))
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', newline='', compresslevel=6)
+    return open(path, 'w', newline='')
+
+def export_grades(out, fmt='csv', since=None, until=None, chunk_size=10000):
+    # Streams quiz_grade through a server-side cursor; memory stays at one chunk
+    table = QuizGrade.__table__
+    query = db.select(*[table.c[name] for name in GRADE_EXPORT_COLUMNS]).order_by(table.c.id)
+    if since is not None:
+        query = query.where(table.c.date_taken >= since)
+    if until is not None:
+        query = query.where(table.c.date_taken < until)
+    result = db.session.execute(query.execution_options(yield_per=chunk_size))
+    rows = 0
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(GRADE_EXPORT_COLUMNS)
+        for chunk in result.partitions():
+            writer.writerows((*row[:5], row[5].isoformat()) for row in chunk)
+            rows += len(chunk)
+    else:
+        for chunk in result.partitions():
+            out.write(''.join(
+                json.dumps({
+                    'id': row[0],
+                    'user_id': row[1],
+                    'course': row[2],
+                    'score': row[3],
+                    'total_questions': row[4],
+                    'date_taken': row[5].isoformat()
+                }) + '\n'
+                for row in chunk
+            ))
+            rows += len(chunk)
+    return rows
+
+def term_bounds(term):
+    # Terms are named YEAR-N, the Nth TERM_MONTHS-long block of the year, e.g. 2024-1
+    try:
+        year, number = (int(part) for part in term.split('-'))
+    except ValueError:
+        raise click.BadParameter(f'{term!r} is not a term like 2024-1')
+    months = app.config['TERM_MONTHS']
+    if not 1 <= number <= 12 // months:
+        raise click.BadParameter(f'{term!r} is not a term like 2024-1')
+    first_month = (number - 1) * months
+    starts = datetime(year, first_month + 1, 1)
+    ends = datetime(year + (first_month + months) // 12, (first_month + months) % 12 + 1, 1)
+    return starts, ends
+
+archive_engines = {}
+archive_engines_lock = threading.Lock()
+
+def archive_engine(path):
+    with archive_engines_lock:
+        engine = archive_engines.get(path)
+        if engine is None:
+            engine = archive_engines[path] = create_engine(f'sqlite:///{path}')
+        return engine
+
+def archive_term(term, chunk_size=10000):
+    """Move a closed term's grades and their responses to the term's archive database.
+
+    Rows are copied a chunk at a time and only deleted from quiz_grade
+    once the archive has committed them; copies ignore rows already
+    there, so an interrupted run can simply be repeated. Course summaries,
+    score buckets and leaderboards are left alone as they already
+    include these attempts; rebuild-summaries reads the archives too.
+    """
+    starts, ends = term_bounds(term)
+    if ends > datetime.utcnow():
+        raise click.BadParameter(f'term {term} has not ended yet')
+    os.makedirs(app.config['ARCHIVE_DIR'], exist_ok=True)
+    path = os.path.join(app.config['ARCHIVE_DIR'], f'quiz_grade_{term}.db')
+    engine = archive_engine(path)
+    db.metadata.create_all(engine, tables=[QuizGrade.__table__, QuestionResponse.__table__])
+    add_client_id_column(engine)
+    grades, responses = QuizGrade.__table__, QuestionResponse.__table__
+    in_term = (grades.c.date_taken >= starts) & (grades.c.date_taken < ends)
+    moved = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(grades).where(in_term, grades.c.id > last_id).order_by(grades.c.id).limit(chunk_size)
+        ).mappings().all()
+        if not rows:
+            break
+        ids = [row['id'] for row in rows]
+        response_rows = db.session.execute(
+            db.select(responses).where(responses.c.grade_id.in_(ids))
+        ).mappings().all()
+        with engine.begin() as archive:
+            archive.execute(sqlite_insert(grades).on_conflict_do_nothing(), [dict(row) for row in rows])
+            if response_rows:
+                archive.execute(sqlite_insert(responses).on_conflict_do_nothing(), [dict(row) for row in response_rows])
+        db.session.execute(db.delete(responses).where(responses.c.grade_id.in_(ids)))
+        db.session.execute(db.delete(grades).where(grades.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(rows)
+        last_id = ids[-1]
+    with engine.connect() as archive:
+        total = archive.execute(db.select(db.func.count()).select_from(grades)).scalar()
+    record = db.session.get(GradeArchive, term) or GradeArchive(term=term)
+    record.path = path
+    record.starts = starts
+    record.ends = ends
+    record.grades = total
+    record.archived_at = datetime.utcnow()
+    db.session.add(record)
+    db.session.commit()
+    return moved
+
+def add_client_id_column(engine):
+    # create_all does not add columns to tables that already exist
+    if 'client_id' not in {column['name'] for column in db.inspect(engine).get_columns('quiz_grade')}:
+        with engine.begin() as connection:
+            connection.execute(db.text('ALTER TABLE quiz_grade ADD COLUMN client_id VARCHAR(64)'))
+
+def init_db():
+    db.create_all()
+    add_client_id_column(db.engine)
+    with db.engine.begin() as connection:
+        # Replaced by ix_quiz_grade_user_client_id: client ids are only unique per student
+        connection.execute(db.text('DROP INDEX IF EXISTS ix_quiz_grade_client_id'))
+    # create_all skips indexes on tables that already exist
+    for table in (QuizGrade.__table__, CourseSummary.__table__):
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+LEADERBOARD_SCORE_LIMIT = 2 ** 31 - 1
+
+class Leaderboard:
+    """Best scores for one course in a sorted array of packed entries.
+
+    Each entry packs (LEADERBOARD_SCORE_LIMIT - best_score, user_id) into
+    one 64-bit integer, so ascending order is highest score first with
+    ties broken by user id. Ranks are found by bisection, and an improved
+    score moves a single entry; best scores are kept in an array indexed
+    by user id (-1 for none), about 12 bytes per student in total.
+    """
+
+    def __init__(self, rows, watermark):
+        self.best = array('i')
+        entries = []
+        for user_id, best_score in rows:
+            self.set_best(user_id, best_score)
+            entries.append(self.pack(best_score, user_id))
+        entries.sort()
+        self.entries = array('q', entries)
+        self.watermark = watermark
+        self.refresh_at = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def pack(score, user_id):
+        return (LEADERBOARD_SCORE_LIMIT - score) << 32 | user_id
+
+    @staticmethod
+    def unpack(entry):
+        return LEADERBOARD_SCORE_LIMIT - (entry >> 32), entry & 0xFFFFFFFF
+
+    def get_best(self, user_id):
+        return self.best[user_id] if user_id < len(self.best) else -1
+
+    def set_best(self, user_id, score):
+        if user_id >= len(self.best):
+            self.best.extend([-1] * (user_id + 1 - len(self.best)))
+        self.best[user_id] = score
+
+    def update(self, user_id, score):
+        with self.lock:
+            previous = self.get_best(user_id)
+            if previous == score:
+                return
+            if previous >= 0:
+                del self.entries[bisect_left(self.entries, self.pack(previous, user_id))]
+            entry = self.pack(score, user_id)
+            self.entries.insert(bisect_left(self.entries, entry), entry)
+            self.set_best(user_id, score)
+
+    def rank_of_score(self, score):
+        # Standard competition ranking: one more than the number of better scores
+        return bisect_left(self.entries, self.pack(score, 0)) + 1
+
+    def standing(self, user_id):
+        with self.lock:
+            score = self.get_best(user_id)
+            if score < 0:
+                return None
+            students = len(self.entries)
+            below = students - bisect_right(self.entries, self.pack(score, 0xFFFFFFFF))
+            return {
+                'rank': self.rank_of_score(score),
+                'score': score,
+                'students': students,
+                # Share of the other students with a lower best score
+                'percentile': below / (students - 1) * 100 if students > 1 else 100.0
+            }
+
+    def page(self, offset, limit):
+        with self.lock:
+            entries = self.entries[offset:offset + limit]
+            students = len(self.entries)
+            return students, [
+                (self.rank_of_score(score), user_id, score)
+                for score, user_id in map(self.unpack, entries)
+            ]
+
+class LeaderboardIndex:
+    """Per-process leaderboards, one per course, built on first use.
+
+    This process's submissions update a board as soon as they commit.
+    Every LEADERBOARD_REFRESH seconds a board also re-reads the summaries
+    taken since its watermark, which picks up grades recorded by other
+    workers. The read overlaps the watermark by GRADE_FLUSH_TIMEOUT,
+    because a write-behind grade can commit after later ones, and
+    re-applying a best score is harmless.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.boards = {}
+        self.lock = threading.Lock()
+
+    def get(self, course):
+        with self.lock:
+            board = self.boards.get(course)
+        if board is None:
+            board = self.load(course)
+        elif time.monotonic() >= board.refresh_at:
+            self.catch_up(course, board)
+        return board
+
+    def load(self, course):
+        rows = db.session.execute(
+            db.select(CourseSummary.user_id, CourseSummary.best_score).where(CourseSummary.course == course)
+        ).all()
+        watermark = db.session.scalar(
+            db.select(db.func.max(CourseSummary.last_taken)).where(CourseSummary.course == course)
+        )
+        board = Leaderboard(rows, watermark)
+        board.refresh_at = time.monotonic() + self.app.config['LEADERBOARD_REFRESH']
+        with self.lock:
+            # Another request may have loaded it meanwhile; keep the first
+            return self.boards.setdefault(course, board)
+
+    def catch_up(self, course, board):
+        board.refresh_at = time.monotonic() + self.app.config['LEADERBOARD_REFRESH']
+        query = db.select(CourseSummary.user_id, CourseSummary.best_score, CourseSummary.last_taken).where(
+            CourseSummary.course == course
+        )
+        if board.watermark is not None:
+            since = board.watermark - timedelta(seconds=self.app.config['GRADE_FLUSH_TIMEOUT'])
+            query = query.where(CourseSummary.last_taken > since)
+        for user_id, best_score, last_taken in db.session.execute(query):
+            board.update(user_id, best_score)
+            if board.watermark is None or last_taken > board.watermark:
+                board.watermark = last_taken
+
+    def record(self, best_scores):
+        # Boards that have not been loaded yet will read these from the database
+        with self.lock:
+            boards = dict(self.boards)
+        for (user_id, course), best_score in best_scores.items():
+            board = boards.get(course)
+            if board is not None:
+                board.update(user_id, best_score)
+
+leaderboards = LeaderboardIndex(app)
+
+class QuestionCache:
+    """Per-process cache of the question bank.
+
+    Holds a compact array of question ids per course (and per stratum
+    once a stratified draw asks for one) plus an LRU of loaded questions,
+    so a quiz only loads the questions it samples.
+    Each lookup compares the course's QuestionBank version and drops
+    that course's entries when the bank has been edited.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.versions = {}
+        self.ids = {}
+        self.strata = {}
+        self.questions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def course_ids(self, course):
+        bank = db.session.get(QuestionBank, course)
+        version = bank.version if bank else 0
+        with self.lock:
+            if self.versions.get(course) != version:
+                self.invalidate(course)
+                self.versions[course] = version
+            ids = self.ids.get(course)
+        if ids is None:
+            ids = array('i', db.session.scalars(db.select(Question.id).where(Question.course == course).order_by(Question.id)))
+            with self.lock:
+                self.ids[course] = ids
+        return ids
+
+    def load(self, question_ids):
+        with self.lock:
+            found = {question_id: self.questions[question_id] for question_id in question_ids if question_id in self.questions}
+            for question_id in found:
+                self.questions.move_to_end(question_id)
+        missing = [question_id for question_id in question_ids if question_id not in found]
+        if missing:
+            loaded = {question.id: question.to_dict() for question in Question.query.filter(Question.id.in_(missing))}
+            found.update(loaded)
+            with self.lock:
+                self.questions.update(loaded)
+                while len(self.questions) > self.app.config['QUESTION_CACHE_SIZE']:
+                    self.questions.popitem(last=False)
+        return [found[question_id] for question_id in question_ids if question_id in found]
+
+    def course_strata(self, course, fields):
+        ids = self.course_ids(course)
+        key = (course, fields)
+        with self.lock:
+            strata = self.strata.get(key)
+        if strata is None:
+            columns = [getattr(Question, field) for field in fields]
+            strata = {}
+            for row in db.session.execute(db.select(Question.id, *columns).where(Question.course == course)):
+                strata.setdefault(tuple(row[1:]), array('i')).append(row[0])
+            with self.lock:
+                # Only keep it if the bank was not edited meanwhile
+                if self.ids.get(course) is ids:
+                    self.strata[key] = strata
+        return strata
+
+    def sample(self, course, count, seed=None, stratify=()):
+        rng = quiz_rng(seed)
+        if stratify:
+            question_ids = stratified_sample(self.course_strata(course, stratify), count, rng)
+        else:
+            question_ids = sample_ids(self.course_ids(course), count, rng)
+        return self.load(question_ids)
+
+    def invalidate(self, course):
+        # Caller holds the lock
+        for key in [key for key in self.strata if key[0] == course]:
+            del self.strata[key]
+        ids = self.ids.pop(course, None) or ()
+        for question_id in ids:
+            self.questions.pop(question_id, None)
+
+question_cache = QuestionCache(app)
+
+def bump_bank_version(course):
+    bank = db.session.get(QuestionBank, course)
+    if bank is None:
+        bank = QuestionBank(course=course, version=0)
+        db.session.add(bank)
+    bank.version += 1
+    bank.updated_at = datetime.utcnow()
+
+def read_question_file(path):
+    # JSON in the COURSE_QUESTIONS shape, or CSV with course, question,
+    # option_1..option_n, correct (0-based index), topic and difficulty columns
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                options = []
+                while row.get(f'option_{len(options) + 1}'):
+                    options.append(row[f'option_{len(options) + 1}'])
+                yield row['course'], {
+                    'question': row['question'],
+                    'options': options,
+                    'correct': int(row['correct']),
+                    'topic': row.get('topic') or None,
+                    'difficulty': int(row['difficulty']) if row.get('difficulty') else None
+                }
+    else:
+        with open(path) as f:
+            for course, questions in json.load(f).items():
+                for question in questions:
+                    yield course, question
+
+def import_questions(items, replace=False, batch_size=1000):
+    courses = set()
+    batch = []
+
+    def flush():
+        db.session.add_all(batch)
+        db.session.flush()
+        batch.clear()
+
+    for course, item in items:
+        if not item['options'] or not 0 <= item['correct'] < len(item['options']):
+            db.session.rollback()
+            raise ValueError(f"{course} question {item['question']!r}: correct must index one of its options")
+        if course not in courses:
+            courses.add(course)
+            if replace:
+                for question in Question.query.filter_by(course=course):
+                    db.session.delete(question)
+            bump_bank_version(course)
+        batch.append(Question(
+            course=course,
+            text=item['question'],
+            topic=item.get('topic'),
+            difficulty=item.get('difficulty'),
+            options=[
+                Option(position=position, text=text, is_correct=position == item['correct'])
+                for position, text in enumerate(item['options'])
+            ]
+        ))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    db.session.commit()
+    return courses
+
+class UserCache:
+    """Per-process LRU cache of logged-in users with a time-to-live.
+
+    Cached users are expunged from the session that loaded them, so they
+    only carry column attributes and are safe to share between requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self.users.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        return None
+
+    def put(self, user):
+        with self.lock:
+            self.users[user.id] = (user, time.monotonic() + self.app.config['USER_CACHE_TTL'])
+            self.users.move_to_end(user.id)
+            while len(self.users) > self.app.config['USER_CACHE_SIZE']:
+                self.users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.users)}
+
+user_cache = UserCache(app)
+
+@event.listens_for(User.password_hash, 'set')
+def password_changed(user, value, oldvalue, initiator):
+    if user.id is not None:
+        user_cache.invalidate(user.id)
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    user = user_cache.get(user_id)
+    if user is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            db.session.expunge(user)
+            user_cache.put(user)
+    return user
+
+grade_tokens = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='grade-submission')
+
+@login_manager.request_loader
+def load_user_from_token(request):
+    # The quiz app fetches questions and submits grades with a bearer token issued when the quiz was launched
+    header = request.headers.get('Authorization', '')
+    if request.endpoint not in ('submit_grade', 'submit_grades', 'questions') or not header.startswith('Bearer '):
+        return None
+    try:
+        user_id = grade_tokens.loads(header[len('Bearer '):], max_age=app.config['GRADE_TOKEN_MAX_AGE'])
+    except BadSignature:
+        return None
+    return load_user(user_id)
+
+class LocalPageStore:
+    """Per-process LRU of rendered pages, grouped by user."""
+
+    def __init__(self, app):
+        self.app = app
+        self.users = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id, path):
+        with self.lock:
+            pages = self.users.get(user_id)
+            if pages is None:
+                return None
+            self.users.move_to_end(user_id)
+            return pages.get(path)
+
+    def set(self, user_id, path, entry):
+        with self.lock:
+            self.users.setdefault(user_id, {})[path] = entry
+            self.users.move_to_end(user_id)
+            while len(self.users) > self.app.config['PAGE_CACHE_USERS']:
+                self.users.popitem(last=False)
+
+    def delete(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def size(self):
+        return len(self.users)
+
+class RedisPageStore:
+    """Rendered pages in Redis, one hash per user, shared by every worker."""
+
+    def __init__(self, app):
+        import redis
+        self.app = app
+        self.client = redis.Redis.from_url(app.config['PAGE_CACHE_URL'])
+
+    def key(self, user_id):
+        return f'page:{user_id}'
+
+    def get(self, user_id, path):
+        value = self.client.hget(self.key(user_id), path)
+        return json.loads(value) if value is not None else None
+
+    def set(self, user_id, path, entry):
+        key = self.key(user_id)
+        pipeline = self.client.pipeline()
+        pipeline.hset(key, path, json.dumps(entry))
+        pipeline.expire(key, self.app.config['PAGE_CACHE_TTL'])
+        pipeline.execute()
+
+    def delete(self, user_id):
+        self.client.delete(self.key(user_id))
+
+    def size(self):
+        return None
+
+PAGE_STORES = {'local': LocalPageStore, 'redis': RedisPageStore}
+
+class PageCache:
+    """Rendered dashboard and course pages with HTTP validators.
+
+    A page's ETag is derived from the course summaries it shows, which
+    change with every recorded grade. A matching If-None-Match (or
+    If-Modified-Since) gets a 304 without rendering, and a cached body
+    is only served while its ETag still matches, so workers that did not
+    see a submission never serve a stale page. Submitting a grade also
+    drops the user's entries from the store.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.store = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get_store(self):
+        # Created on first use so the backend can be chosen after import
+        with self.lock:
+            if self.store is None:
+                self.store = PAGE_STORES[self.app.config['PAGE_CACHE_BACKEND']](self.app)
+            return self.store
+
+    def respond(self, summaries, render):
+        user = current_user
+        summaries = [summary for summary in summaries if summary is not None]
+        validator = ';'.join(
+            [self.app.config['PAGE_CACHE_VERSION'], str(user.id), user.username, str(user.progress)] +
+            [f'{summary.course}:{summary.attempts}:{summary.last_taken.isoformat()}' for summary in summaries]
+        )
+        etag = hashlib.sha1(f'{request.full_path};{validator}'.encode()).hexdigest()
+        last_modified = max((summary.last_taken for summary in summaries), default=None)
+        if session.get('_flashes'):
+            # Flashed messages are shown once, so this render cannot be reused
+            return render()
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            self.not_modified += 1
+            response = Response(status=304)
+        else:
+            store = self.get_store()
+            entry = store.get(user.id, request.full_path)
+            if entry is not None and entry['etag'] == etag:
+                self.hits += 1
+                body = entry['body']
+            else:
+                self.misses += 1
+                body = render()
+                store.set(user.id, request.full_path, {'etag': etag, 'body': body})
+            response = Response(body, mimetype='text/html')
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # Private to this user, and always revalidated so a new grade shows at once
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    def invalidate(self, user_id):
+        self.get_store().delete(user_id)
+
+    def stats(self):
+        served = self.hits + self.misses + self.not_modified
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'hit_rate': (self.hits + self.not_modified) / served if served else None,
+            'size': self.store.size() if self.store is not None else 0
+        }
+
+page_cache = PageCache(app)
+
+class Histogram:
+    """Fixed-bucket histogram rendered as Prometheus cumulative buckets."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+class RequestMetrics:
+    """Per-endpoint latency, SQL and connection pool statistics for /metrics.
+
+    Counts are per process; with several workers each scrape sees the
+    worker that answered it, so label or aggregate by instance.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.latency = {}
+        self.queries = {}
+        self.query_seconds = {}
+        self.responses = {}
+        self.background_queries = 0
+        self.background_query_seconds = 0.0
+        self.pool_peak = 0
+
+    def record_request(self, endpoint, status, seconds, queries, query_seconds):
+        with self.lock:
+            latency = self.latency.get(endpoint)
+            if latency is None:
+                latency = self.latency[endpoint] = Histogram(self.app.config['METRICS_LATENCY_BUCKETS'])
+                self.queries[endpoint] = Histogram(self.app.config['METRICS_QUERY_BUCKETS'])
+                self.query_seconds[endpoint] = 0.0
+            latency.observe(seconds)
+            self.queries[endpoint].observe(queries)
+            self.query_seconds[endpoint] += query_seconds
+            self.responses[(endpoint, status)] = self.responses.get((endpoint, status), 0) + 1
+
+    def record_query(self, seconds):
+        # Statements run outside a request, e.g. by the grade writer
+        with self.lock:
+            self.background_queries += 1
+            self.background_query_seconds += seconds
+
+    def record_checkout(self, checked_out):
+        if checked_out > self.pool_peak:
+            self.pool_peak = checked_out
+
+    def render(self, pool):
+        lines = []
+        with self.lock:
+            lines.append('# TYPE http_request_duration_seconds histogram')
+            for endpoint, histogram in sorted(self.latency.items()):
+                lines.extend(histogram.lines('http_request_duration_seconds', f'endpoint="{endpoint}"'))
+            lines.append('# TYPE http_responses_total counter')
+            for (endpoint, status), count in sorted(self.responses.items()):
+                lines.append(f'http_responses_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+            lines.append('# TYPE http_request_sql_queries histogram')
+            for endpoint, histogram in sorted(self.queries.items()):
+                lines.extend(histogram.lines('http_request_sql_queries', f'endpoint="{endpoint}"'))
+            lines.append('# TYPE http_request_sql_seconds_total counter')
+            for endpoint, seconds in sorted(self.query_seconds.items()):
+                lines.append(f'http_request_sql_seconds_total{{endpoint="{endpoint}"}} {seconds:.6f}')
+            lines.append('# TYPE background_sql_queries_total counter')
+            lines.append(f'background_sql_queries_total {self.background_queries}')
+            lines.append('# TYPE background_sql_seconds_total counter')
+            lines.append(f'background_sql_seconds_total {self.background_query_seconds:.6f}')
+        # QueuePool reports these; other pool classes may not
+        gauges = {
+            'db_pool_size': getattr(pool, 'size', None),
+            'db_pool_checked_out': getattr(pool, 'checkedout', None),
+            'db_pool_overflow': getattr(pool, 'overflow', None)
+        }
+        for name, value in gauges.items():
+            if value is not None:
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name} {value()}')
+        lines.append('# TYPE db_pool_checked_out_peak gauge')
+        lines.append(f'db_pool_checked_out_peak {self.pool_peak}')
+        cache_counters = {
+            'user_cache_hits_total': user_cache.hits,
+            'user_cache_misses_total': user_cache.misses,
+            'page_cache_hits_total': page_cache.hits,
+            'page_cache_misses_total': page_cache.misses,
+            'page_cache_not_modified_total': page_cache.not_modified,
+            'grade_writer_committed_total': grade_writer.committed,
+            'grade_writer_flushes_total': grade_writer.flushes
+        }
+        for name, value in cache_counters.items():
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics(app)
+
+with app.app_context():
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(db.engine, 'after_cursor_execute')
+    def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        record_query_time(conn)
+
+    @event.listens_for(db.engine, 'handle_error')
+    def stop_failed_query_timer(exception_context):
+        # after_cursor_execute never fires for a failed statement, which would leave its start time
+        # on the pooled connection for good; errors outside a statement have nothing to pop
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_started'):
+            record_query_time(conn)
+
+    def record_query_time(conn):
+        seconds = time.perf_counter() - conn.info['query_started'].pop()
+        if has_request_context() and 'query_count' in g:
+            g.query_count += 1
+            g.query_seconds += seconds
+        else:
+            request_metrics.record_query(seconds)
+
+    @event.listens_for(db.engine, 'checkout')
+    def record_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkedout = getattr(db.engine.pool, 'checkedout', None)
+        if checkedout is not None:
+            request_metrics.record_checkout(checkedout())
+
+class SamplingProfiler:
+    """Opt-in sampling profiler for slow requests.
+
+    While PROFILE_SLOW_REQUESTS is set, a background thread samples the
+    stack of every thread that is serving a request each
+    PROFILE_INTERVAL seconds. When a request ends at or above the
+    threshold its samples are written to PROFILE_DIR in folded-stack
+    format (one "frame;frame;frame count" line per stack), ready for
+    flamegraph.pl or speedscope; faster requests are discarded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.active = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.written = 0
+
+    @property
+    def enabled(self):
+        return self.app.config['PROFILE_SLOW_REQUESTS'] > 0
+
+    def begin(self):
+        self._ensure_started()
+        with self.lock:
+            self.active[threading.get_ident()] = {}
+
+    def end(self, label, seconds):
+        with self.lock:
+            stacks = self.active.pop(threading.get_ident(), None)
+        if not stacks or seconds < self.app.config['PROFILE_SLOW_REQUESTS']:
+            return None
+        os.makedirs(self.app.config['PROFILE_DIR'], exist_ok=True)
+        path = os.path.join(
+            self.app.config['PROFILE_DIR'],
+            f'{datetime.utcnow():%Y%m%dT%H%M%S%f}-{label}-{seconds * 1000:.0f}ms.folded'
+        )
+        with open(path, 'w') as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f'{label};{stack} {count}\n')
+        self.written += 1
+        return path
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own thread
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.app.config['PROFILE_INTERVAL'])
+            frames = sys._current_frames()
+            with self.lock:
+                for ident, stacks in self.active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stack = self.fold(frame)
+                        stacks[stack] = stacks.get(stack, 0) + 1
+
+    @staticmethod
+    def fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+request_profiler = SamplingProfiler(app)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.query_count = 0
+    g.query_seconds = 0.0
+    if request_profiler.enabled:
+        request_profiler.begin()
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_started' in g:
+        seconds = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or 'unmatched'
+        request_metrics.record_request(endpoint, response.status_code, seconds, g.query_count, g.query_seconds)
+        if request_profiler.enabled:
+            request_profiler.end(endpoint, seconds)
+    return response
+
+class AdmissionControl:
+    """Sheds login, registration and grade submission bursts with 429s.
+
+    The in-flight slots and token buckets live in a memory-mapped file
+    locked with flock, so every gunicorn worker on the host enforces the
+    same limits. A rejected request never reaches the password hasher or
+    the database; it is answered at once with Retry-After instead of
+    queuing behind them. Slots held by a worker that died are reclaimed when an endpoint
+    is full. Without fcntl (Windows) the limits are per process.
+    """
+
+    MAX_SLOTS = 256
+    HEADER = struct.Struct('<Q')
+    BUCKET = struct.Struct('<Qdd')  # key hash, tokens, last refill
+    PROBES = 8
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.pid = None
+        self.map = None
+        self.file = None
+        self.admitted = {}
+        self.shed = {}
+
+    def _ensure_started(self):
+        # Reopened after a fork so each worker maps the file itself
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            try:
+                import fcntl
+            except ImportError:
+                fcntl = None
+            endpoints = list(self.app.config['ADMISSION_LIMITS'])
+            buckets = self.app.config['ADMISSION_BUCKETS']
+            self.endpoints = {endpoint: index for index, endpoint in enumerate(endpoints)}
+            self.bucket_offset = self.HEADER.size + len(endpoints) * self.MAX_SLOTS * 4
+            self.buckets = buckets
+            size = self.bucket_offset + buckets * self.BUCKET.size
+            layout = hashlib.blake2b(repr((endpoints, self.MAX_SLOTS, buckets)).encode(), digest_size=8).digest()
+            self.fcntl = fcntl
+            if fcntl is None:
+                self.map = mmap.mmap(-1, size)
+            else:
+                path = self.app.config['ADMISSION_FILE']
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self.file = open(path, 'a+b')
+                fcntl.flock(self.file, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(self.file.fileno()).st_size != size:
+                        self.file.truncate(size)
+                    self.map = mmap.mmap(self.file.fileno(), size)
+                    if self.map[:self.HEADER.size] != layout:
+                        # A new file or one left by a differently configured server
+                        self.map[:] = bytes(size)
+                        self.map[:self.HEADER.size] = layout
+                finally:
+                    fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.pid = os.getpid()
+
+    @contextlib.contextmanager
+    def locked(self):
+        with self.lock:
+            if self.fcntl is not None:
+                self.fcntl.flock(self.file, self.fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if self.fcntl is not None:
+                    self.fcntl.flock(self.file, self.fcntl.LOCK_UN)
+
+    def refill(self, key, rate, burst, now):
+        # Finds (or makes room for) key's bucket; returns its offset, hash and current tokens
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        start = key_hash % self.buckets
+        victim = None
+        for probe in range(self.PROBES):
+            offset = self.bucket_offset + (start + probe) % self.buckets * self.BUCKET.size
+            found, tokens, updated = self.BUCKET.unpack_from(self.map, offset)
+            if found == key_hash:
+                tokens = min(burst, tokens + (now - updated) * rate)
+                break
+            if victim is None or updated < victim[1]:
+                victim = (offset, updated)
+        else:
+            # Not seen recently: start full, replacing the least recently used bucket in range
+            offset, tokens = victim[0], burst
+        return offset, key_hash, tokens
+
+    def acquire(self, index, limit):
+        # Claims an in-flight slot for this process; returns its offset, or None when the endpoint is full
+        base = self.HEADER.size + index * self.MAX_SLOTS * 4
+        pids = array('i', self.map[base:base + min(limit, self.MAX_SLOTS) * 4])
+        slot = pids.index(0) if 0 in pids else None
+        if slot is None:
+            for position, pid in enumerate(pids):
+                if pid != self.pid and not process_alive(pid):
+                    slot = position
+                    break
+            else:
+                return None
+        offset = base + slot * 4
+        struct.pack_into('<i', self.map, offset, self.pid)
+        return offset
+
+    def admit(self, endpoint, ip, user):
+        # Returns (slot, 0) when admitted, otherwise (None, seconds the client should wait)
+        limits = self.app.config['ADMISSION_LIMITS'][endpoint]
+        self._ensure_started()
+        now = time.time()
+        slot = None
+        with self.locked():
+            buckets = []
+            for kind, key in (('ip', ip), ('user', user)):
+                if kind in limits and key is not None:
+                    rate, burst = limits[kind]
+                    offset, key_hash, tokens = self.refill(f'{endpoint}:{kind}:{key}', rate, burst, now)
+                    # Stored at once so the next key's lookup cannot claim the same free entry
+                    self.BUCKET.pack_into(self.map, offset, key_hash, tokens, now)
+                    buckets.append((rate, offset, key_hash, tokens))
+            wait = max([(1 - tokens) / rate for rate, _, _, tokens in buckets if tokens < 1], default=0)
+            if not wait:
+                slot = self.acquire(self.endpoints[endpoint], limits['concurrency'])
+                if slot is None:
+                    wait = 1
+            if not wait:
+                # Tokens are only spent by admitted requests, so a refusal costs the client nothing
+                for rate, offset, key_hash, tokens in buckets:
+                    self.BUCKET.pack_into(self.map, offset, key_hash, tokens - 1, now)
+            counts = self.shed if wait else self.admitted
+            counts[endpoint] = counts.get(endpoint, 0) + 1
+        return slot, wait
+
+    def release(self, offset):
+        with self.locked():
+            if struct.unpack_from('<i', self.map, offset)[0] == self.pid:
+                struct.pack_into('<i', self.map, offset, 0)
+
+    def stats(self):
+        with self.lock:
+            return {'admitted': dict(self.admitted), 'shed': dict(self.shed)}
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+admission = AdmissionControl(app)
+
+@app.before_request
+def admit_request():
+    if (not app.config['ADMISSION_CONTROL'] or request.method != 'POST'
+            or request.endpoint not in app.config['ADMISSION_LIMITS']):
+        return
+    if request.endpoint in ('login', 'register'):
+        # Not yet authenticated: keyed with the IP too, or anyone could lock a student out by name
+        username = request.form.get('username')
+        user = None if username is None else f'{username}@{request.remote_addr}'
+    else:
+        user = current_user.id if current_user.is_authenticated else None
+    g.admission_slot, wait = admission.admit(request.endpoint, request.remote_addr, user)
+    if wait:
+        abort(429, retry_after=math.ceil(wait))
+
+@app.teardown_request
+def release_admission(exc):
+    offset = g.pop('admission_slot', None)
+    if offset is not None:
+        admission.release(offset)
+
+def grade_events(after_id, course=None, limit=1000, until=None):
+    query = db.select(
+        QuizGrade.id, User.username, QuizGrade.course, QuizGrade.score, QuizGrade.total_questions, QuizGrade.date_taken
+    ).join(User, User.id == QuizGrade.user_id).where(QuizGrade.id > after_id).order_by(QuizGrade.id).limit(limit)
+    if course is not None:
+        query = query.where(QuizGrade.course == course)
+    if until is not None:
+        query = query.where(QuizGrade.id <= until)
+    return [
+        {
+            'id': grade_id,
+            'username': username,
+            'course': grade_course,
+            'score': score,
+            'total_questions': total_questions,
+            'date_taken': date_taken.isoformat()
+        }
+        for grade_id, username, grade_course, score, total_questions, date_taken in db.session.execute(query)
+    ]
+
+class FeedSubscriber:
+    """One feed client's pending events, capped at FEED_BUFFER_SIZE.
+
+    When a client falls behind the oldest events are dropped and counted,
+    so a stalled connection holds a fixed amount of memory.
+    """
+
+    def __init__(self, course, size):
+        self.course = course
+        # The feed's position when this subscriber joined; later grades arrive live
+        self.start_id = None
+        self.events = deque(maxlen=size)
+        self.dropped = 0
+        self.ready = threading.Event()
+
+    def put(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        self.ready.set()
+
+    def take(self, timeout):
+        # Returns (events, dropped since the last call), waiting up to timeout for at least one
+        self.ready.wait(timeout)
+        self.ready.clear()
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+class GradeFeed:
+    """In-process fan-out of newly recorded grades to feed subscribers.
+
+    While anyone is subscribed, one thread per process tails quiz_grade
+    by id every FEED_POLL_INTERVAL seconds and copies each new grade to
+    the matching subscribers. That is one query per worker however many
+    proctors are watching, and grades recorded by any worker reach every
+    worker's subscribers. Submissions handled here call notify() so they
+    go out at once instead of on the next poll.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.last_id = None
+        self.published = 0
+
+    def subscribe(self, course=None):
+        subscriber = FeedSubscriber(course, self.app.config['FEED_BUFFER_SIZE'])
+        with self.lock:
+            if not self.subscribers:
+                # The poller stands still while nobody watches, so start from the newest grade
+                self.last_id = db.session.scalar(db.select(db.func.max(QuizGrade.id))) or 0
+            subscriber.start_id = self.last_id
+            self.subscribers.add(subscriber)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='grade-feed', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def notify(self):
+        self.wakeup.set()
+
+    def publish(self, grade_event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            if subscriber.course is None or subscriber.course == grade_event['course']:
+                subscriber.put(grade_event)
+        self.published += 1
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.app.config['FEED_POLL_INTERVAL'])
+            self.wakeup.clear()
+            with self.lock:
+                idle = not self.subscribers
+            if idle:
+                continue
+            try:
+                with self.app.app_context():
+                    while True:
+                        events = grade_events(self.last_id)
+                        for grade_event in events:
+                            # Advanced first (and never backwards) so a subscriber joining
+                            # meanwhile finds the event in either its backlog or its queue
+                            with self.lock:
+                                self.last_id = max(self.last_id, grade_event['id'])
+                            self.publish(grade_event)
+                        if len(events) < 1000:
+                            break
+            except Exception:
+                self.app.logger.exception('Grade feed poll failed')
+
+    def stats(self):
+        with self.lock:
+            return {'subscribers': len(self.subscribers), 'published': self.published}
+
+grade_feed = GradeFeed(app)
+
+def sse_message(data, event_id=None, event=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+password_pool = None
+password_pool_lock = threading.Lock()
+
+def gevent_patched():
+    # True under gunicorn's gevent worker
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('threading')
+
+def run_password_task(func, *args):
+    # Hashing is CPU bound, so run it in this worker's process pool when one is configured
+    global password_pool
+    if not app.config['PASSWORD_HASH_WORKERS']:
+        return func(*args)
+    if gevent_patched():
+        # The process pool's manager thread would be a greenlet blocking the whole event loop
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args)
+    with password_pool_lock:
+        if password_pool is None:
+            # Forking this worker could copy a lock held by one of its threads (grade writer, feed,
+            # profiler) into the child, so fork hashing processes from a clean forkserver instead
+            forkserver = 'forkserver' in multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver') if forkserver else None
+            password_pool = ProcessPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'], mp_context=context)
+    return password_pool.submit(func, *args).result()
+
+def hash_password(password):
+    return run_password_task(generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'])
+
+def verify_password(password_hash, password):
+    return run_password_task(check_password_hash, password_hash, password)
+
+@functools.lru_cache(maxsize=None)
+def hash_method_prefix(method):
+    # The method as Werkzeug stores it, e.g. 'scrypt' is saved as 'scrypt:32768:8:1'
+    return generate_password_hash('', method).split('$', 1)[0]
+
+def needs_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != hash_method_prefix(app.config['PASSWORD_HASH_METHOD'])
 
 @app.route('/')
 def index():
@@ -45,7 +1904,11 @@ def login():
         password = request.form.get('password')
         user = User.query.filter_by(username=username).first()
         
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(user.password_hash, password):
+            if needs_rehash(user.password_hash):
+                # Upgrade hashes made with an older method or cost
+                user.password_hash = hash_password(password)
+                db.session.commit()
             login_user(user)
             return redirect(url_for('dashboard'))
         flash('Invalid username or password')
@@ -63,7 +1926,7 @@ def register():
             
         user = User(
             username=username,
-            password_hash=generate_password_hash(password)
+            password_hash=hash_password(password)
         )
         db.session.add(user)
         db.session.commit()
@@ -73,29 +1936,82 @@ def register():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    # Get the latest grade for each course
-    python_grade = QuizGrade.query.filter_by(user_id=current_user.id, course='python').order_by(QuizGrade.date_taken.desc()).first()
-    database_grade = QuizGrade.query.filter_by(user_id=current_user.id, course='database').order_by(QuizGrade.date_taken.desc()).first()
-    web_grade = QuizGrade.query.filter_by(user_id=current_user.id, course='web').order_by(QuizGrade.date_taken.desc()).first()
+    # Get the summary for each course
+    summaries = course_summaries(current_user.id)
     
-    return render_template('dashboard.html', 
-                         python_grade=python_grade,
-                         database_grade=database_grade,
-                         web_grade=web_grade)
+    return page_cache.respond(
+        [summaries.get(course) for course in ('python', 'database', 'web')],
+        lambda: render_template('dashboard.html', 
+                                python_summary=summaries.get('python'),
+                                database_summary=summaries.get('database'),
+                                web_summary=summaries.get('web'))
+    )
 
 @app.route('/course/<int:course_id>')
 @login_required
 def course(course_id):
-    # Get all grades for the specific course
-    course_name = 'python' if course_id == 1 else 'database' if course_id == 2 else 'web'
-    grades = QuizGrade.query.filter_by(user_id=current_user.id, course=course_name).order_by(QuizGrade.date_taken.desc()).all()
-    return render_template('course.html', course_id=course_id, grades=grades)
+    # Get one page of grades for the specific course
+    course_name = course_for_id(course_id)
+    page_size = app.config['HISTORY_PAGE_SIZE']
+    cursor = request.args.get('before')
+    cursor = decode_cursor(cursor) if cursor else None
+    summary = db.session.get(CourseSummary, (current_user.id, course_name))
+
+    def render():
+        grades, next_cursor = history_page(current_user.id, course_name, cursor, page_size)
+        return render_template('course.html', course_id=course_id, grades=grades,
+                               summary=summary, next_cursor=next_cursor, paged=cursor is not None)
+
+    return page_cache.respond([summary], render)
+
+@app.route('/course/<int:course_id>/history')
+@login_required
+def course_history(course_id):
+    # Stream the full history as NDJSON without materialising it
+    course_name = course_for_id(course_id)
+    query = history_query(current_user.id, course_name)
+
+    def generate():
+        live = db.session.scalars(query.execution_options(yield_per=500))
+        for grade in itertools.chain(live, iter_archived_history(current_user.id, course_name)):
+            yield json.dumps({
+                'id': grade.id,
+                'course': grade.course,
+                'score': grade.score,
+                'total_questions': grade.total_questions,
+                'date_taken': grade.date_taken.isoformat()
+            }) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def send_to_quiz_host(message):
+    with socket.create_connection(('127.0.0.1', app.config['QUIZ_HOST_PORT']), timeout=1) as connection:
+        connection.sendall(message)
+
+def launch_quiz(course, seed=None, token=None):
+    message = (json.dumps({'course': course, 'seed': seed, 'token': token, 'requested_at': time.time()}) + '\n').encode()
+    try:
+        send_to_quiz_host(message)
+    except OSError:
+        # No quiz host yet: start one and wait for it to listen
+        subprocess.Popen(['python', 'quiz_host.py'])
+        for attempt in range(50):
+            time.sleep(0.1)
+            try:
+                send_to_quiz_host(message)
+                return
+            except OSError:
+                pass
+        raise
 
 @app.route('/start_quiz/<course>')
 @login_required
 def start_quiz(course):
     try:
-        subprocess.Popen(['python', 'quiz_app.py', course])
+        # Seed the question draw per student and attempt so it can be reproduced
+        summary = db.session.get(CourseSummary, (current_user.id, course))
+        attempt = (summary.attempts if summary else 0) + 1
+        launch_quiz(course, f'{current_user.id}:{course}:{attempt}', grade_tokens.dumps(current_user.id))
         return redirect(url_for('dashboard'))
     except Exception as e:
         flash('Error starting quiz: ' + str(e))
@@ -105,23 +2021,296 @@ def start_quiz(course):
 @login_required
 def submit_grade():
     data = request.get_json()
-    grade = QuizGrade(
-        user_id=current_user.id,
-        course=data['course'],
-        score=data['score'],
-        total_questions=data['total_questions']
-    )
-    db.session.add(grade)
-    db.session.commit()
+    values = grade_values(current_user.id, data)
+    if not unrecorded([values]):
+        return jsonify({'status': 'success'})
+    if app.config['GRADE_WRITE_BEHIND']:
+        # Return our pooled connection first so the writer is never starved of one
+        db.session.close()
+        try:
+            grade_writer.submit(values).result(timeout=app.config['GRADE_FLUSH_TIMEOUT'])
+        except FutureTimeoutError:
+            # Still queued and may yet commit, so this is neither a success nor a failure
+            page_cache.invalidate(current_user.id)
+            return jsonify({'status': 'pending'}), 202
+    else:
+        try:
+            best_scores = commit_grades([values])
+        except IntegrityError:
+            db.session.rollback()
+            if unrecorded([values]):
+                raise
+            # A retry that raced its original, which has committed since
+            return jsonify({'status': 'success'})
+        leaderboards.record(best_scores)
+        grade_feed.notify()
+    page_cache.invalidate(current_user.id)
     return jsonify({'status': 'success'})
 
+@app.route('/submit_grades', methods=['POST'])
+@login_required
+def submit_grades():
+    # Record many grades in a single transaction
+    data = request.get_json()
+    if not isinstance(data, dict) or not isinstance(data.get('grades'), list):
+        abort(400)
+    grades = [grade_values(current_user.id, item) for item in data['grades']]
+    fresh = unrecorded(grades)
+    try:
+        best_scores = commit_grades(fresh)
+    except IntegrityError:
+        # A retry raced its original: drop whatever has committed since and try once more
+        db.session.rollback()
+        fresh = unrecorded(grades)
+        best_scores = commit_grades(fresh)
+    leaderboards.record(best_scores)
+    grade_feed.notify()
+    page_cache.invalidate(current_user.id)
+    return jsonify({'status': 'success', 'count': len(grades), 'duplicates': len(grades) - len(fresh)})
+
+@app.route('/questions/<course>')
+@login_required
+def questions(course):
+    # Sample of the course bank in the COURSE_QUESTIONS shape for the quiz app
+    if not known_course(course):
+        abort(404)
+    count = request.args.get('count', 10, type=int)
+    if not 1 <= count <= 50:
+        abort(400)
+    seed = request.args.get('seed')
+    # Seeds are '<user id>:<course>:<attempt>'; nobody may draw another student's quiz
+    if seed is not None and not seed.startswith(f'{current_user.id}:'):
+        abort(403)
+    stratify = tuple(field for field in request.args.get('stratify', '').split(',') if field)
+    if any(field not in ('topic', 'difficulty') for field in stratify):
+        abort(400)
+    return jsonify({'course': course, 'questions': question_cache.sample(course, count, seed, stratify)})
+
+def analytics_bin_width():
+    bin_width = request.args.get('bin_width', 10, type=int)
+    if not 1 <= bin_width <= 100:
+        abort(400)
+    return bin_width
+
+@app.route('/analytics')
+@login_required
+def analytics():
+    bin_width = analytics_bin_width()
+    courses = db.session.scalars(db.select(ScoreBucket.course).distinct().order_by(ScoreBucket.course))
+    return jsonify({'courses': {course: course_analytics(course, bin_width) for course in courses}})
+
+@app.route('/analytics/<course>')
+@login_required
+def course_analytics_view(course):
+    return jsonify(course_analytics(course, analytics_bin_width()))
+
+@app.route('/leaderboard/<course>')
+@login_required
+def leaderboard(course):
+    if not known_course(course):
+        abort(404)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', app.config['LEADERBOARD_PAGE_SIZE'], type=int), 1), 100)
+    students, entries = leaderboards.get(course).page(offset, limit)
+    usernames = dict(db.session.execute(
+        db.select(User.id, User.username).where(User.id.in_([user_id for _, user_id, _ in entries]))
+    ).all())
+    return jsonify({
+        'course': course,
+        'students': students,
+        'offset': offset,
+        'entries': [
+            {'rank': rank, 'username': usernames.get(user_id), 'best_score': score}
+            for rank, user_id, score in entries
+        ]
+    })
+
+@app.route('/leaderboard/<course>/me')
+@login_required
+def my_rank(course):
+    if not known_course(course):
+        abort(404)
+    standing = leaderboards.get(course).standing(current_user.id)
+    if standing is None:
+        return jsonify({'course': course, 'rank': None})
+    return jsonify(dict(standing, course=course))
+
+def proctor_required(view):
+    @functools.wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if current_user.username not in app.config['PROCTORS']:
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+@app.route('/feed')
+@app.route('/feed/<course>')
+@proctor_required
+def feed(course=None):
+    # Server-sent events for each new grade; reconnecting browsers resume from Last-Event-ID
+    if not request.environ.get('wsgi.multithread'):
+        # A sync worker would be tied up by one stream until gunicorn's timeout kills it
+        abort(503, description='The grade feed needs a gevent (or gthread) worker, e.g. GUNICORN_WORKER_CLASS=gevent')
+    subscriber = grade_feed.subscribe(course)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    backlog = []
+    skipped = 0
+    if last_event_id is not None:
+        limit = app.config['FEED_BUFFER_SIZE']
+        backlog = grade_events(last_event_id, course, limit=limit, until=subscriber.start_id)
+        if len(backlog) == limit:
+            # Grades between a full backlog and the live events are counted, not replayed
+            query = db.select(db.func.count()).select_from(QuizGrade).where(
+                QuizGrade.id > backlog[-1]['id'], QuizGrade.id <= subscriber.start_id
+            )
+            if course is not None:
+                query = query.where(QuizGrade.course == course)
+            skipped = db.session.scalar(query)
+    keepalive = app.config['FEED_KEEPALIVE']
+
+    # No stream_with_context: the stream holds no request context or database connection
+    def generate():
+        sent = last_event_id or 0
+        try:
+            yield 'retry: 3000\n\n'
+            events = backlog
+            if skipped:
+                for grade_event in backlog:
+                    yield sse_message(grade_event, grade_event['id'])
+                # Carries an id so a reconnect resumes after the skipped grades
+                sent = subscriber.start_id
+                yield sse_message({'dropped': skipped}, sent, event='overflow')
+                events = []
+            while True:
+                for grade_event in events:
+                    # The backlog and the live events can overlap
+                    if grade_event['id'] > sent:
+                        sent = grade_event['id']
+                        yield sse_message(grade_event, grade_event['id'])
+                events, dropped = subscriber.take(keepalive)
+                if dropped:
+                    yield sse_message({'dropped': dropped}, event='overflow')
+                if not events and not dropped:
+                    yield ': keepalive\n\n'
+        finally:
+            grade_feed.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/stats')
+@login_required
+def stats():
+    return jsonify({
+        'user_cache': user_cache.stats(),
+        'page_cache': page_cache.stats(),
+        'grade_feed': grade_feed.stats(),
+        'admission': admission.stats(),
+        'grade_writer': {'committed': grade_writer.committed, 'flushes': grade_writer.flushes}
+    })
+
+@app.route('/metrics')
+def metrics():
+    return Response(request_metrics.render(db.engine.pool), mimetype='text/plain; version=0.0.4')
+
+@app.cli.command('rebuild-summaries')
+@click.option('--batch-size', default=1000, help='Users per batch')
+def rebuild_summaries_command(batch_size):
+    """Rebuild the course_summary and score_bucket tables from quiz_grade and archived terms."""
+    rebuild_course_summaries(batch_size)
+    rebuild_score_buckets()
+    click.echo('Course summaries and score buckets rebuilt')
+
+@app.cli.command('import-questions')
+@click.argument('path', required=False)
+@click.option('--replace', is_flag=True, help='Delete existing questions for each imported course first')
+@click.option('--batch-size', default=1000, help='Questions per flush')
+def import_questions_command(path, replace, batch_size):
+    """Bulk-load questions from a JSON or CSV bank (the built-in questions if no PATH)."""
+    if path:
+        items = read_question_file(path)
+    else:
+        items = ((course, question) for course, questions in COURSE_QUESTIONS.items() for question in questions)
+    try:
+        courses = import_questions(items, replace, batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Imported questions for {', '.join(sorted(courses))}")
+
+@app.cli.command('item-analysis')
+@click.option('--output', type=click.File('w'), default='-', help='CSV file to write (standard output by default)')
+@click.option('--batch-size', default=10000, help='Responses fetched per round trip')
+def item_analysis_command(output, batch_size):
+    """Compute difficulty and discrimination for every question from quiz responses."""
+    writer = csv.writer(output)
+    writer.writerow(['question_id', 'responses', 'difficulty', 'discrimination', 'mean_time_ms'])
+    for question_id, item in sorted(item_analysis(batch_size).items()):
+        discrimination = item.discrimination
+        writer.writerow([
+            question_id,
+            item.responses,
+            f'{item.difficulty:.4f}',
+            '' if discrimination is None else f'{discrimination:.4f}',
+            f'{item.mean_time_ms:.0f}'
+        ])
+
+@app.cli.command('export-grades')
+@click.argument('path', default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default='csv')
+@click.option('--since', type=click.DateTime(), help='Only grades taken on or after this date')
+@click.option('--until', type=click.DateTime(), help='Only grades taken before this date')
+@click.option('--chunk-size', default=10000, help='Rows fetched per round trip')
+def export_grades_command(path, fmt, since, until, chunk_size):
+    """Stream quiz_grade to PATH as CSV or NDJSON (gzipped if PATH ends in .gz)."""
+    started = time.perf_counter()
+    with open_export(path) as out:
+        rows = export_grades(out, fmt, since, until, chunk_size)
+    elapsed = time.perf_counter() - started
+    click.echo(f'Exported {rows} grades in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)', err=True)
+
+@app.cli.command('archive-grades')
+@click.argument('term')
+@click.option('--chunk-size', default=10000, help='Grades moved per transaction')
+def archive_grades_command(term, chunk_size):
+    """Move the grades of a closed TERM (e.g. 2024-1) into its own archive database."""
+    started = time.perf_counter()
+    moved = archive_term(term, chunk_size)
+    elapsed = time.perf_counter() - started
+    click.echo(f'Archived {moved} grades from {term} in {elapsed:.1f}s ({moved / max(elapsed, 1e-9):,.0f} rows/s)')
+
 @app.route('/logout')
 @login_required
 def logout():
+    user_cache.invalidate(current_user.id)
     logout_user()
     return redirect(url_for('index'))
 
+def warm_app():
+    """Return the module-level app with everything a worker needs already loaded.
+
+    This is not an application factory: the app, its config, engine and
+    subsystems are all built when this module is imported. It does the
+    work each process would otherwise repeat on its first requests, so
+    that under gunicorn's preload_app (see gunicorn.conf.py) it runs once
+    in the master and is shared copy-on-write by the workers. It never
+    touches the schema: run 'flask migrate' for that.
+    """
+    with app.app_context():
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        db.Model.registry.configure()
+        # Nothing opened here may be inherited by a forked worker
+        db.engine.dispose()
+    return app
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Create missing tables and indexes."""
+    init_db()
+    click.echo('Database schema is up to date')
+
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
-    app.run(debug=True) 
\ No newline at end of file
+        init_db()
+    warm_app().run(debug=True) 
\ No newline at end of file
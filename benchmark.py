@@ -0,0 +1,927 @@
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Point the app at a throwaway database before it is imported
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db'))
+# Every simulated client shares one IP, so per-IP and per-user limits are only on where a benchmark asks for them
+os.environ.setdefault('ADMISSION_CONTROL', '0')
+os.environ.setdefault('ADMISSION_FILE', os.path.join(tempfile.mkdtemp(), 'admission.bin'))
+
+import app as webapp
+from app import app, db, User, QuizGrade
+from quiz_engine import COURSE_QUESTIONS, QuizSession, DeadlineScheduler
+from grade_spool import GradeSpool
+
+COURSES = ['python', 'database', 'web']
+PASSWORD = 'benchmark'
+PASSWORD_HASH = generate_password_hash(PASSWORD)
+
+def seed(users, grades, chunk=50000):
+    db.drop_all()
+    webapp.init_db()
+    db.session.execute(db.insert(User), [
+        {'id': i, 'username': f'student{i}', 'password_hash': PASSWORD_HASH, 'progress': 0}
+        for i in range(1, users + 1)
+    ])
+    start = datetime(2024, 1, 1)
+    for offset in range(0, grades, chunk):
+        db.session.execute(db.insert(QuizGrade), [
+            {
+                'user_id': random.randint(1, users),
+                'course': random.choice(COURSES),
+                'score': random.randint(0, 5),
+                'total_questions': 5,
+                'date_taken': start + timedelta(seconds=random.randint(0, 10_000_000)),
+            }
+            for _ in range(offset, min(offset + chunk, grades))
+        ])
+    db.session.commit()
+    webapp.rebuild_course_summaries()
+    webapp.rebuild_score_buckets()
+
+def percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100)
+    return {'p50': cuts[49] * 1000, 'p99': cuts[98] * 1000}
+
+def time_requests(path, users, requests):
+    client = app.test_client()
+    samples = []
+    for _ in range(requests):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(random.randint(1, users))
+        started = time.perf_counter()
+        response = client.get(path)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return percentiles(samples)
+
+def report(name, result):
+    print(f'{name:<30} ' + '  '.join(f'{key}={value:.2f}ms' for key, value in result.items()))
+
+def legacy_course_summaries(user_id):
+    # The original dashboard path: one unindexed query per course
+    summaries = {}
+    for course in COURSES:
+        grade = QuizGrade.query.filter_by(user_id=user_id, course=course).order_by(QuizGrade.date_taken.desc()).first()
+        if grade:
+            summaries[course] = SimpleNamespace(
+                latest_score=grade.score,
+                latest_total_questions=grade.total_questions,
+                last_taken=grade.date_taken
+            )
+    return summaries
+
+def legacy_course_analytics(course):
+    # What the analytics would cost without aggregates: every grade of the course through the ORM
+    counts = [0] * 101
+    for grade in QuizGrade.query.filter_by(course=course).yield_per(10000):
+        counts[int(grade.percentage)] += 1
+    total = sum(counts)
+    return {'attempts': total, 'percentiles': {
+        f'p{p}': webapp.histogram_percentile(counts, total, p) for p in (10, 25, 50, 75, 90)
+    }}
+
+def bench_analytics(args):
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.users, args.grades)
+        print(f'seeded {args.grades:,} grades in {time.perf_counter() - started:.1f}s')
+        for course in COURSES:
+            started = time.perf_counter()
+            legacy = legacy_course_analytics(course)
+            print(f'{course} ORM scan of {legacy["attempts"]:,} grades: {(time.perf_counter() - started) * 1000:.0f}ms')
+            assert legacy['percentiles'] == webapp.course_analytics(course)['percentiles']
+            if args.scan_once:
+                break
+        report('/analytics/<course>', time_requests(f'/analytics/{COURSES[0]}', args.users, args.requests))
+
+def bench_items(args):
+    # Item analysis over simulated responses; each question has a known difficulty
+    with app.app_context():
+        db.drop_all()
+        webapp.init_db()
+        difficulty = [random.uniform(0.2, 0.9) for _ in range(args.questions)]
+        grade_id = 0
+        for offset in range(0, args.grades, 10000):
+            grades, responses = [], []
+            for grade_id in range(grade_id + 1, grade_id + 1 + min(10000, args.grades - offset)):
+                ability = random.gauss(0, 0.15)
+                questions = random.sample(range(1, args.questions + 1), 10)
+                correct = [random.random() < difficulty[question - 1] + ability for question in questions]
+                grades.append({'id': grade_id, 'user_id': 1, 'course': 'python', 'score': sum(correct),
+                               'total_questions': 10, 'date_taken': datetime(2024, 1, 1)})
+                responses.extend(
+                    {'grade_id': grade_id, 'question_id': question, 'chosen': 0, 'correct': right,
+                     'time_ms': random.randint(2000, 60000)}
+                    for question, right in zip(questions, correct)
+                )
+            db.session.execute(db.insert(QuizGrade), grades)
+            db.session.execute(db.insert(webapp.QuestionResponse), responses)
+        db.session.commit()
+        tracemalloc.start()
+        started = time.perf_counter()
+        items = webapp.item_analysis()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        error = max(abs(items[question].difficulty - difficulty[question - 1]) for question in items)
+        responses = sum(item.responses for item in items.values())
+        print(f'{responses:,} responses over {len(items)} questions in {elapsed:.1f}s '
+              f'({responses / elapsed:,.0f}/s), peak {peak / 2 ** 20:.1f}MiB, max difficulty error {error:.3f}')
+
+def bench_dashboard(args):
+    # Queries and rendering only: the page cache (see bench_pages) is bypassed in both runs
+    respond = webapp.page_cache.respond
+    webapp.page_cache.respond = lambda summaries, render: render()
+    try:
+        with app.app_context():
+            seed(args.users, args.grades)
+            index = next(index for index in QuizGrade.__table__.indexes if index.name == 'ix_quiz_grade_user_course_date')
+
+            index.drop(db.engine)
+            optimized = webapp.course_summaries
+            webapp.course_summaries = legacy_course_summaries
+            try:
+                report('dashboard (before)', time_requests('/dashboard', args.users, args.requests))
+            finally:
+                webapp.course_summaries = optimized
+                index.create(db.engine)
+            report('dashboard (after)', time_requests('/dashboard', args.users, args.requests))
+    finally:
+        webapp.page_cache.respond = respond
+
+def bench_pages(args):
+    # Rendering versus cached bodies versus 304s, per page
+    with app.app_context():
+        seed(args.users, args.grades)
+    clients = [logged_in_client(user_id) for user_id in range(1, args.clients + 1)]
+    for path in ('/dashboard', '/course/1'):
+        rendered, cached, revalidated = [], [], []
+        for _ in range(args.requests):
+            client = random.choice(clients)
+            webapp.page_cache.invalidate(int(client.user_id))
+            started = time.perf_counter()
+            etag = client.get(path).headers['ETag']
+            rendered.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            assert client.get(path).status_code == 200
+            cached.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+            revalidated.append(time.perf_counter() - started)
+        report(f'{path} rendered', percentiles(rendered))
+        report(f'{path} from cache', percentiles(cached))
+        report(f'{path} 304', percentiles(revalidated))
+    print(webapp.page_cache.stats())
+
+def bench_leaderboard(args):
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.users, args.grades)
+        print(f'seeded {args.users:,} users and {args.grades:,} grades in {time.perf_counter() - started:.1f}s')
+        started = time.perf_counter()
+        board = webapp.leaderboards.get('python')
+        print(f'python board of {len(board.entries):,} students loaded in {(time.perf_counter() - started) * 1000:.0f}ms, '
+              f'{(board.entries.itemsize * len(board.entries) + board.best.itemsize * len(board.best)) / 2 ** 20:.1f}MiB')
+        samples = []
+        for _ in range(args.requests // 10):
+            score = random.randint(0, 5)
+            started = time.perf_counter()
+            db.session.scalar(db.select(db.func.count()).select_from(webapp.CourseSummary).where(
+                webapp.CourseSummary.course == 'python', webapp.CourseSummary.best_score > score
+            ))
+            samples.append(time.perf_counter() - started)
+        report('rank by COUNT(*) query', percentiles(samples))
+    app.config['LEADERBOARD_REFRESH'] = 3600
+    report('/leaderboard/python/me', time_requests('/leaderboard/python/me', args.users, args.requests))
+    report('/leaderboard/python', time_requests(
+        f'/leaderboard/python?offset={random.randrange(len(board.entries))}', args.users, args.requests
+    ))
+    started = time.perf_counter()
+    for _ in range(args.updates):
+        board.update(random.randint(1, args.users), random.randint(0, 5))
+    elapsed = time.perf_counter() - started
+    print(f'{args.updates:,} score updates at {elapsed / args.updates * 1e6:.1f}us each')
+
+def bench_export(args):
+    # Rows per second for streaming export and term archival, with the export's peak memory
+    with app.app_context():
+        seed(args.users, args.grades)
+        directory = tempfile.mkdtemp()
+        for fmt, name in (('csv', 'grades.csv'), ('csv', 'grades.csv.gz'), ('ndjson', 'grades.ndjson.gz')):
+            path = os.path.join(directory, name)
+            tracemalloc.start()
+            started = time.perf_counter()
+            with webapp.open_export(path) as out:
+                rows = webapp.export_grades(out, fmt)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f'export {name:<18} {rows / elapsed:>10,.0f} rows/s  peak {peak / 2 ** 20:.1f}MiB  '
+                  f'{os.path.getsize(path) / 2 ** 20:.1f}MiB on disk')
+        report('/course/1 before archival', time_requests('/course/1', args.users, args.requests))
+        app.config['ARCHIVE_DIR'] = os.path.join(directory, 'archive')
+        started = time.perf_counter()
+        moved = webapp.archive_term('2024-1')
+        elapsed = time.perf_counter() - started
+        print(f'archived {moved:,} grades at {moved / elapsed:,.0f} rows/s')
+    # Every grade is now archived, so each page is read from the term database
+    app.config['PAGE_CACHE_VERSION'] = 'archived'
+    report('/course/1 from archive', time_requests('/course/1', args.users, args.requests))
+
+def logged_in_client(user_id):
+    client = app.test_client()
+    client.user_id = str(user_id)
+    with client.session_transaction() as session:
+        session['_user_id'] = client.user_id
+    return client
+
+def run_clients(clients, work):
+    threads = [threading.Thread(target=work, args=(client,)) for client in clients]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+def bench_ingest(args):
+    grade = {'course': 'python', 'score': 4, 'total_questions': 5}
+
+    def single(client):
+        for _ in range(args.per_client):
+            assert client.post('/submit_grade', json=grade).status_code == 200
+
+    def batched(client):
+        for _ in range(0, args.per_client, args.batch):
+            assert client.post('/submit_grades', json={'grades': [grade] * args.batch}).status_code == 200
+
+    total = args.clients * args.per_client
+    for name, write_behind, work in [
+        ('submit_grade (direct)', False, single),
+        ('submit_grade (write-behind)', True, single),
+        (f'submit_grades (batch of {args.batch})', False, batched),
+    ]:
+        with app.app_context():
+            seed(args.clients, 0)
+        app.config['GRADE_WRITE_BEHIND'] = write_behind
+        clients = [logged_in_client(user_id) for user_id in range(1, args.clients + 1)]
+        elapsed = run_clients(clients, work)
+        print(f'{name:<30} {total / elapsed:,.0f} grades/s')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(workers, env, *options, target='app:app'):
+    # target=None serves gunicorn.conf.py's wsgi_app
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', '--log-level', 'warning',
+         *options, *([target] if target else [])],
+        env={**os.environ, **env}
+    )
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(500):
+        try:
+            requests.get(url, timeout=1)
+            return server, url
+        except requests.RequestException:
+            time.sleep(0.02)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+def bench_profiles(args):
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    for profile in args.profiles:
+        with app.app_context():
+            seed(args.users, args.grades)
+            journal_mode = webapp.DATABASE_PROFILES[profile]['pragmas'].get('journal_mode', 'DELETE')
+            db.session.execute(db.text(f'PRAGMA journal_mode={journal_mode}'))
+            db.session.commit()
+            db.engine.dispose()
+
+        server, url = start_gunicorn(args.workers, {'DATABASE_PROFILE': profile})
+        latencies = {'read': [], 'write': []}
+        errors = []
+        sessions = {user_id: requests.Session() for user_id in range(1, args.clients + 1)}
+
+        def login(user_id):
+            sessions[user_id].post(f'{url}/login', data={'username': f'student{user_id}', 'password': PASSWORD})
+
+        def traffic(user_id):
+            session = sessions[user_id]
+            while time.monotonic() < deadline:
+                kind = 'write' if random.random() < args.write_ratio else 'read'
+                started = time.perf_counter()
+                if kind == 'write':
+                    response = session.post(f'{url}/submit_grade', json={'course': random.choice(COURSES), 'score': 3, 'total_questions': 5})
+                else:
+                    response = session.get(f'{url}/dashboard', allow_redirects=False)
+                if response.status_code == 200:
+                    latencies[kind].append(time.perf_counter() - started)
+                else:
+                    errors.append(response.status_code)
+
+        try:
+            run_clients(sessions, login)
+            deadline = time.monotonic() + args.duration
+            run_clients(sessions, traffic)
+        finally:
+            server.terminate()
+            server.wait()
+        completed = len(latencies['read']) + len(latencies['write'])
+        print(f'{profile}: {completed / args.duration:,.0f} req/s, {len(errors)} errors')
+        for kind, samples in latencies.items():
+            if len(samples) > 1:
+                report(f'  {kind}', percentiles(samples))
+
+def exam_day_phase(sessions, work):
+    # Runs work(user_id, session, record) on every client at once; returns samples per endpoint and elapsed seconds
+    samples, errors = {}, {}
+    lock = threading.Lock()
+
+    def record(endpoint, started, response, ok=(200,)):
+        elapsed = time.perf_counter() - started
+        with lock:
+            if response.status_code in ok:
+                samples.setdefault(endpoint, []).append(elapsed)
+            else:
+                errors[endpoint] = errors.get(endpoint, 0) + 1
+
+    elapsed = run_clients(sessions.items(), lambda item: work(item[0], item[1], record))
+    return samples, errors, elapsed
+
+def bench_exam_day(args):
+    # login burst -> question fetch -> dashboard polling -> submission spike, through gunicorn
+    random.seed(args.seed)
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    with app.app_context():
+        seed(args.users, args.grades)
+        webapp.import_questions(
+            (course, question) for course, questions in COURSE_QUESTIONS.items() for question in questions
+        )
+        db.engine.dispose()
+    server, url = start_gunicorn(args.workers, {})
+    sessions = {user_id: requests.Session() for user_id in random.sample(range(1, args.users + 1), args.clients)}
+
+    def login(user_id, session, record):
+        started = time.perf_counter()
+        record('POST /login', started, session.post(
+            f'{url}/login', data={'username': f'student{user_id}', 'password': PASSWORD}, allow_redirects=False
+        ), ok=(302,))
+
+    def fetch_questions(user_id, session, record):
+        course = random.choice(COURSES)
+        started = time.perf_counter()
+        record('GET /questions', started, session.get(f'{url}/questions/{course}?count=10&seed={user_id}:{course}:1'))
+
+    def poll_dashboard(user_id, session, record):
+        etag = None
+        deadline = time.monotonic() + args.poll_duration
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            response = session.get(f'{url}/dashboard', headers={'If-None-Match': etag} if etag else {},
+                                   allow_redirects=False)
+            record('GET /dashboard', started, response, ok=(200, 304))
+            etag = response.headers.get('ETag', etag)
+            time.sleep(random.uniform(0, 2 * args.poll_interval))
+
+    def submit_spike(user_id, session, record):
+        for _ in range(args.submissions):
+            started = time.perf_counter()
+            record('POST /submit_grade', started, session.post(f'{url}/submit_grade', json={
+                'course': random.choice(COURSES), 'score': random.randint(0, 10), 'total_questions': 10
+            }))
+
+    results, failed = {}, {}
+    try:
+        for work in (login, fetch_questions, poll_dashboard, submit_spike):
+            samples, errors, elapsed = exam_day_phase(sessions, work)
+            failed.update(errors)
+            for endpoint, latencies in samples.items():
+                results[endpoint] = {'requests': len(latencies), 'throughput': len(latencies) / elapsed}
+                # statistics.quantiles needs at least two samples, e.g. not with --clients 1
+                if len(latencies) > 1:
+                    results[endpoint].update(percentiles(latencies))
+    finally:
+        server.terminate()
+        server.wait()
+
+    for endpoint, result in results.items():
+        line = f'{endpoint:<22} {result["requests"]:>6} requests  {result["throughput"]:>8.1f} req/s'
+        if 'p50' in result:
+            line += f'  p50={result["p50"]:.2f}ms  p99={result["p99"]:.2f}ms'
+        print(line)
+    for endpoint, count in failed.items():
+        print(f'{endpoint:<22} {count} failed requests')
+
+    scale = {name: getattr(args, name) for name in ('users', 'grades', 'clients', 'workers', 'submissions', 'seed')}
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'scale': scale, 'results': results}, f, indent=2, sort_keys=True)
+        print(f'baseline written to {args.save_baseline}')
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['scale'] != scale:
+            print(f'warning: baseline was recorded at {baseline["scale"]}')
+        regressions = []
+        for endpoint, before in baseline['results'].items():
+            after = results.get(endpoint)
+            if after is None:
+                regressions.append(f'{endpoint}: no successful requests')
+                continue
+            for key in ('p50', 'p99'):
+                if key in before and key in after and after[key] > before[key] * (1 + args.threshold):
+                    regressions.append(f'{endpoint}: {key} {before[key]:.2f}ms -> {after[key]:.2f}ms')
+            if after['throughput'] < before['throughput'] * (1 - args.threshold):
+                regressions.append(f'{endpoint}: throughput {before["throughput"]:.1f} -> {after["throughput"]:.1f} req/s')
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions or failed:
+            sys.exit(1)
+        print(f'no regressions beyond {args.threshold:.0%} of the baseline')
+
+def bench_admission(args):
+    # Every client logs in (retrying after 429s) then submits grades, all at once through threaded workers
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    with app.app_context():
+        seed(args.clients, 0)
+        db.engine.dispose()
+    for enabled in ('0', '1'):
+        # No keep-alive: gunicorn 20.1's gthread worker can leave a request on a reused idle connection unanswered
+        server, url = start_gunicorn(args.workers, {'ADMISSION_CONTROL': enabled}, '-k', 'gthread',
+                                     '--threads', str(args.threads), '--timeout', '120', '--keep-alive', '0')
+        admitted, shed, failed = {}, {}, {}
+        lock = threading.Lock()
+
+        def send(endpoint, session, ok, *request_args, **request_kwargs):
+            started = time.perf_counter()
+            try:
+                response = session.post(*request_args, timeout=args.timeout, allow_redirects=False, **request_kwargs)
+                status = response.status_code
+            except requests.RequestException:
+                response, status = None, None
+            elapsed = time.perf_counter() - started
+            with lock:
+                outcome = admitted if status in ok else shed if status == 429 else failed
+                outcome.setdefault(endpoint, []).append(elapsed)
+            return response, status
+
+        def work(item):
+            user_id, session = item
+            for attempt in range(args.attempts):
+                response, status = send('POST /login', session, (302,), f'{url}/login',
+                                        data={'username': f'student{user_id}', 'password': PASSWORD})
+                if status != 429:
+                    break
+                # Honour Retry-After, backing off further while the server keeps shedding
+                retry_after = int(response.headers.get('Retry-After', 1))
+                time.sleep(max(retry_after, min(0.5 * 2 ** attempt, 8)) * random.uniform(1, 1.5))
+            for _ in range(args.submissions):
+                send('POST /submit_grade', session, (200,), f'{url}/submit_grade',
+                     json={'course': random.choice(COURSES), 'score': 3, 'total_questions': 5})
+
+        try:
+            sessions = {user_id: requests.Session() for user_id in range(1, args.clients + 1)}
+            elapsed = run_clients(sessions.items(), work)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f'admission control {"on" if enabled == "1" else "off"}: {elapsed:.1f}s for the whole burst')
+        for endpoint in ('POST /login', 'POST /submit_grade'):
+            ok, rejected, errors = admitted.get(endpoint, []), shed.get(endpoint, []), failed.get(endpoint, [])
+            line = f'  {endpoint:<20} admitted {len(ok):5}  shed {len(rejected):5}  failed {len(errors):5}'
+            if len(ok) > 1:
+                line += '  admitted ' + '  '.join(f'{key}={value:.0f}ms' for key, value in percentiles(ok).items())
+            if len(rejected) > 1:
+                line += f'  shed p99={percentiles(rejected)["p99"]:.1f}ms'
+            print(line)
+
+def worker_memory(server, field):
+    # A /proc memory field (kB) per gunicorn worker under the master process, in MiB
+    with open(f'/proc/{server.pid}/task/{server.pid}/children') as f:
+        children = f.read().split()
+    sizes = []
+    for pid in children:
+        # Pss (shared pages split between the processes sharing them) is only in smaps_rollup
+        with open(f'/proc/{pid}/status' if field == 'VmRSS' else f'/proc/{pid}/smaps_rollup') as f:
+            sizes.append(next(int(line.split()[1]) for line in f if line.startswith(field + ':')) / 1024)
+    return sizes
+
+def worker_rss(server):
+    return sum(worker_memory(server, 'VmRSS'))
+
+def bench_workers(args):
+    # Worker startup and memory with every worker importing the app versus the app preloaded and warmed by warm_app()
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    with app.app_context():
+        seed(args.users, args.grades)
+        db.engine.dispose()
+    client = requests.Session()
+    # An empty config file stops gunicorn picking up ./gunicorn.conf.py
+    no_config = os.path.join(tempfile.mkdtemp(), 'gunicorn.conf.py')
+    open(no_config, 'w').close()
+    for name, options, target in [
+        ('import per worker', ('-c', no_config), 'app:app'),
+        ('preload (gunicorn.conf.py)', ('-c', 'gunicorn.conf.py'), None),
+    ]:
+        started = time.perf_counter()
+        server, url = start_gunicorn(args.workers, {}, *options, target=target)
+        first_response = time.perf_counter() - started
+        try:
+            # Let every worker finish booting and render each page at least once
+            time.sleep(1)
+            for _ in range(args.workers * 4):
+                client.post(f'{url}/login', data={'username': 'student1', 'password': PASSWORD})
+                client.get(f'{url}/dashboard')
+                client.get(f'{url}/course/1')
+                client.get(f'{url}/logout')
+            rss = worker_memory(server, 'VmRSS')
+            pss = worker_memory(server, 'Pss')
+        finally:
+            server.terminate()
+            server.wait()
+        print(f'{name:<28} first response {first_response * 1000:6.0f}ms  '
+              f'RSS/worker {statistics.mean(rss):5.1f} MiB  PSS/worker {statistics.mean(pss):5.1f} MiB  '
+              f'PSS total {sum(pss):6.1f} MiB')
+
+def bench_feed(args):
+    # Thousands of idle SSE subscribers on one gevent worker, then a burst of submissions
+    import selectors
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    with app.app_context():
+        seed(100, 1000)
+        db.engine.dispose()
+    server, url = start_gunicorn(1, {'PROCTORS': 'student1'}, '-k', 'gevent', '--worker-connections', str(args.subscribers + 100))
+    port = int(url.rsplit(':', 1)[1])
+    submitter = requests.Session()
+    submitter.post(f'{url}/login', data={'username': 'student1', 'password': PASSWORD})
+    cookie = '; '.join(f'{name}={value}' for name, value in submitter.cookies.items())
+    try:
+        time.sleep(0.5)
+        idle_rss = worker_rss(server)
+        selector = selectors.DefaultSelector()
+        stalled = int(args.subscribers * args.stalled)
+        sockets = []
+        for index in range(args.subscribers):
+            sock = socket.create_connection(('127.0.0.1', port))
+            sock.sendall(f'GET /feed HTTP/1.1\r\nHost: localhost\r\nCookie: {cookie}\r\n\r\n'.encode())
+            sockets.append(sock)
+            if index >= stalled:
+                sock.setblocking(False)
+                selector.register(sock, selectors.EVENT_READ, [])
+        reading = True
+
+        def read_events():
+            while reading:
+                for key, _ in selector.select(timeout=0.1):
+                    try:
+                        chunk = key.fileobj.recv(65536)
+                    except BlockingIOError:
+                        continue
+                    now = time.perf_counter()
+                    for line in chunk.split(b'\n'):
+                        if line.startswith(b'id: '):
+                            key.data.append((int(line[4:]), now))
+
+        reader = threading.Thread(target=read_events)
+        reader.start()
+        time.sleep(2)
+        subscribed_rss = worker_rss(server)
+        print(f'{args.subscribers:,} subscribers ({stalled:,} never reading): worker RSS {idle_rss:.1f}MiB idle, '
+              f'{subscribed_rss:.1f}MiB subscribed ({(subscribed_rss - idle_rss) * 1024 / args.subscribers:.1f}KiB each)')
+
+        sent = []
+        for _ in range(args.grades):
+            sent.append(time.perf_counter())
+            submitter.post(f'{url}/submit_grade', json={'course': random.choice(COURSES), 'score': 3, 'total_questions': 5})
+            time.sleep(args.interval)
+        time.sleep(2)
+        reading = False
+        reader.join()
+        final_rss = worker_rss(server)
+        latencies = []
+        first_id = None
+        for key in selector.get_map().values():
+            for event_id, received_at in key.data:
+                first_id = event_id if first_id is None else min(first_id, event_id)
+        for key in selector.get_map().values():
+            for event_id, received_at in key.data:
+                latencies.append(received_at - sent[event_id - first_id])
+        expected = args.grades * (args.subscribers - stalled)
+        print(f'{len(latencies):,}/{expected:,} events delivered, worker RSS after the burst {final_rss:.1f}MiB')
+        if len(latencies) > 1:
+            report('submit to subscriber', percentiles(latencies))
+        for sock in sockets:
+            sock.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+def bench_passwords(args):
+    # One process doing nothing but verification approximates logins per second per core
+    for method in args.methods:
+        password_hash = generate_password_hash(PASSWORD, method)
+        started = time.perf_counter()
+        for _ in range(args.logins):
+            check_password_hash(password_hash, PASSWORD)
+        elapsed = time.perf_counter() - started
+        print(f'{method:<30} {args.logins / elapsed:,.1f} logins/s/core')
+
+def bench_sessions(args):
+    # Many concurrent headless quiz attempts driven from one process
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    sessions = [QuizSession(course, COURSE_QUESTIONS[course]) for course in random.choices(COURSES, k=args.sessions)]
+    now = time.time()
+    for session in sessions:
+        session.start(now)
+    for session in sessions:
+        while True:
+            session.choose(random.randrange(4))
+            if not session.next(now):
+                break
+    scores = [session.submit(now + 300) for session in sessions]
+    elapsed = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    print(f'{args.sessions:,} sessions in {elapsed:.2f}s ({args.sessions / elapsed:,.0f}/s), '
+          f'{memory / args.sessions:.0f} bytes/session, mean score {statistics.mean(scores):.2f}')
+
+class StandInServer(ThreadingHTTPServer):
+    """Minimal /submit_grades endpoint that fails its first requests."""
+
+    def __init__(self, failures=0, delay=0):
+        self.failures = failures
+        self.delay = delay
+        self.received = []
+        super().__init__(('127.0.0.1', free_port()), StandInHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.server.delay)
+        if self.server.failures > 0:
+            self.server.failures -= 1
+            self.send_response(503)
+        else:
+            self.server.received.extend(body['grades'])
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"status": "success"}')
+
+    def log_message(self, format, *args):
+        pass
+
+def bench_spool(args):
+    server = StandInServer(failures=args.failures)
+    spool = GradeSpool(os.path.join(tempfile.mkdtemp(), 'grades.spool'), server.url, min_backoff=0.05)
+    started = time.perf_counter()
+    for score in range(args.grades):
+        spool.submit({'course': 'python', 'score': score % 6, 'total_questions': 5})
+    submitted = time.perf_counter() - started
+    while spool.pending_count():
+        time.sleep(0.01)
+    delivered = time.perf_counter() - started
+    assert len(server.received) == args.grades
+    print(f'{args.grades} grades spooled in {submitted * 1000:.1f}ms, delivered after '
+          f'{args.failures} failed requests in {delivered * 1000:.1f}ms')
+    server.shutdown()
+
+def bench_submit(args):
+    # Time from pressing submit to the results dialog, and to the server's acknowledgement
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PySide6.QtWidgets import QApplication
+    import grade_spool
+    from quiz_app import QuizApp
+
+    qt_app = QApplication.instance() or QApplication([])
+    server = StandInServer(delay=args.delay)
+    grade_spool.spool = GradeSpool(os.path.join(tempfile.mkdtemp(), 'grades.spool'), server.url)
+    to_results, to_ack = [], []
+    for _ in range(args.runs):
+        window = QuizApp('python')
+        window.start_quiz()
+        acknowledged = threading.Event()
+        window.grade_status_changed.connect(lambda status: status == 'delivered' and acknowledged.set())
+        started = time.perf_counter()
+        window.submit_quiz()
+        to_results.append(time.perf_counter() - started)
+        while not acknowledged.is_set():
+            qt_app.processEvents()
+            time.sleep(0.001)
+        to_ack.append(time.perf_counter() - started)
+        window.results_box.done(0)
+        qt_app.processEvents()
+    report(f'submit to results (server {args.delay * 1000:.0f}ms)', percentiles(to_results))
+    report('submit to acknowledgement', percentiles(to_ack))
+    server.shutdown()
+
+STARTUP_PROBE = """
+import json, sys, time
+from quiz_app import QuizApp
+from PySide6.QtWidgets import QApplication
+app = QApplication(sys.argv)
+window = QuizApp('python')
+def painted():
+    result['painted_at'] = time.time()
+    # A student reads the instructions while the questions are fetched
+    window.questions.result()
+    window.start_button.click()
+def question_shown():
+    print(json.dumps(dict(result, **window.timings)), flush=True)
+    app.quit()
+result = {}
+window.first_painted.connect(painted)
+window.first_question_shown.connect(question_shown)
+window.show()
+app.exec()
+"""
+
+def bench_startup(args):
+    # Fresh interpreter per run: launch to first paint, and start click to first question
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', LEARNHUB_URL=f'http://127.0.0.1:{free_port()}')
+    to_paint, in_process, to_question = [], [], []
+    for _ in range(args.runs):
+        launched = time.time()
+        output = subprocess.run([sys.executable, '-c', STARTUP_PROBE], env=env, capture_output=True,
+                                text=True, timeout=60).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        to_paint.append(result['painted_at'] - launched)
+        in_process.append(result['first_paint'] / 1000)
+        to_question.append(result['question_render'] / 1000)
+    report('process launch to first paint', percentiles(to_paint))
+    report('quiz_app import to first paint', percentiles(in_process))
+    report('start click to first question', percentiles(to_question))
+
+def bench_deadlines(args):
+    # One heap enforcing the time limit of many headless sessions on a simulated clock
+    scheduler = DeadlineScheduler()
+    sessions = []
+    for _ in range(args.sessions):
+        session = QuizSession('python', COURSE_QUESTIONS['python'], duration=random.randint(60, 600))
+        session.start(now=random.uniform(0, 60))
+        scheduler.add_session(session)
+        sessions.append(session)
+    started = time.perf_counter()
+    ticks = 0
+    now = 0
+    while scheduler.next_deadline() is not None:
+        now += 1
+        scheduler.run_due(now)
+        ticks += 1
+    elapsed = time.perf_counter() - started
+    assert not any(session.in_progress for session in sessions)
+    print(f'{args.sessions:,} deadlines enforced over {ticks} simulated seconds in {elapsed * 1000:.1f}ms '
+          f'({elapsed / ticks * 1e6:.1f}us per tick)')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Learning platform benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    dashboard = subparsers.add_parser('dashboard', help='latest-grade-per-course page latency')
+    dashboard.add_argument('--users', type=int, default=10000)
+    dashboard.add_argument('--grades', type=int, default=1000000)
+    dashboard.add_argument('--requests', type=int, default=500)
+    dashboard.set_defaults(func=bench_dashboard)
+
+    analytics = subparsers.add_parser('analytics', help='cohort analytics from score buckets versus a full grade scan')
+    analytics.add_argument('--users', type=int, default=100000)
+    analytics.add_argument('--grades', type=int, default=10000000)
+    analytics.add_argument('--requests', type=int, default=500)
+    analytics.add_argument('--scan-once', action='store_true', help='time the full scan for one course only')
+    analytics.set_defaults(func=bench_analytics)
+
+    items = subparsers.add_parser('items', help='streaming item analysis over per-question responses')
+    items.add_argument('--grades', type=int, default=300000)
+    items.add_argument('--questions', type=int, default=500)
+    items.set_defaults(func=bench_items)
+
+    pages = subparsers.add_parser('pages', help='dashboard and course pages rendered, cached and revalidated')
+    pages.add_argument('--users', type=int, default=10000)
+    pages.add_argument('--grades', type=int, default=1000000)
+    pages.add_argument('--clients', type=int, default=100)
+    pages.add_argument('--requests', type=int, default=300)
+    pages.set_defaults(func=bench_pages)
+
+    leaderboard = subparsers.add_parser('leaderboard', help='rank lookups from the in-memory leaderboard')
+    leaderboard.add_argument('--users', type=int, default=1000000)
+    leaderboard.add_argument('--grades', type=int, default=3000000)
+    leaderboard.add_argument('--requests', type=int, default=500)
+    leaderboard.add_argument('--updates', type=int, default=100000)
+    leaderboard.set_defaults(func=bench_leaderboard)
+
+    export = subparsers.add_parser('export', help='streaming export and term archival throughput')
+    export.add_argument('--users', type=int, default=10000)
+    export.add_argument('--grades', type=int, default=1000000)
+    export.add_argument('--requests', type=int, default=300)
+    export.set_defaults(func=bench_export)
+
+    ingest = subparsers.add_parser('ingest', help='grades committed per second under concurrent submission')
+    ingest.add_argument('--clients', type=int, default=50)
+    ingest.add_argument('--per-client', type=int, default=40)
+    ingest.add_argument('--batch', type=int, default=20)
+    ingest.set_defaults(func=bench_ingest)
+
+    profiles = subparsers.add_parser('profiles', help='mixed read/write traffic through gunicorn per database profile')
+    profiles.add_argument('--profiles', nargs='+', default=['sqlite-default', 'sqlite-wal'])
+    profiles.add_argument('--workers', type=int, default=4)
+    profiles.add_argument('--clients', type=int, default=32)
+    profiles.add_argument('--users', type=int, default=1000)
+    profiles.add_argument('--grades', type=int, default=100000)
+    profiles.add_argument('--duration', type=float, default=10)
+    profiles.add_argument('--write-ratio', type=float, default=0.2)
+    profiles.set_defaults(func=bench_profiles)
+
+    exam_day = subparsers.add_parser('exam-day', help='login, quiz fetch, dashboard polling and submission spike through gunicorn')
+    exam_day.add_argument('--users', type=int, default=10000)
+    exam_day.add_argument('--grades', type=int, default=200000)
+    exam_day.add_argument('--clients', type=int, default=50)
+    exam_day.add_argument('--workers', type=int, default=4)
+    exam_day.add_argument('--poll-duration', type=float, default=10, help='seconds of dashboard polling')
+    exam_day.add_argument('--poll-interval', type=float, default=0.5, help='mean seconds between polls per client')
+    exam_day.add_argument('--submissions', type=int, default=5, help='grades each client submits in the spike')
+    exam_day.add_argument('--seed', type=int, default=1, help='random seed for the data and the traffic')
+    exam_day.add_argument('--save-baseline', metavar='PATH', help='write the results as a JSON baseline')
+    exam_day.add_argument('--baseline', metavar='PATH', help='compare with a JSON baseline and exit 1 on regression')
+    exam_day.add_argument('--threshold', type=float, default=0.2, help='allowed regression as a fraction of the baseline')
+    exam_day.set_defaults(func=bench_exam_day)
+
+    feed = subparsers.add_parser('feed', help='SSE grade feed fan-out to many subscribers on a gevent worker')
+    feed.add_argument('--subscribers', type=int, default=2000)
+    feed.add_argument('--stalled', type=float, default=0.1, help='fraction of subscribers that never read')
+    feed.add_argument('--grades', type=int, default=50)
+    feed.add_argument('--interval', type=float, default=0.05, help='seconds between submissions')
+    feed.set_defaults(func=bench_feed)
+
+    admission = subparsers.add_parser('admission', help='login and submission burst with and without admission control')
+    admission.add_argument('--clients', type=int, default=300)
+    admission.add_argument('--workers', type=int, default=2)
+    admission.add_argument('--threads', type=int, default=32)
+    admission.add_argument('--submissions', type=int, default=3)
+    admission.add_argument('--attempts', type=int, default=20, help='login attempts per client before giving up')
+    admission.add_argument('--timeout', type=float, default=30, help='client timeout per request in seconds')
+    admission.set_defaults(func=bench_admission)
+
+    workers = subparsers.add_parser('workers', help='gunicorn worker startup and memory with and without preloading')
+    workers.add_argument('--workers', type=int, default=4)
+    workers.add_argument('--users', type=int, default=1000)
+    workers.add_argument('--grades', type=int, default=50000)
+    workers.set_defaults(func=bench_workers)
+
+    passwords = subparsers.add_parser('passwords', help='password verification throughput per hash cost')
+    passwords.add_argument('--methods', nargs='+', default=[
+        'scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000'
+    ])
+    passwords.add_argument('--logins', type=int, default=50)
+    passwords.set_defaults(func=bench_passwords)
+
+    sessions = subparsers.add_parser('sessions', help='headless quiz sessions simulated in one process')
+    sessions.add_argument('--sessions', type=int, default=50000)
+    sessions.set_defaults(func=bench_sessions)
+
+    spool = subparsers.add_parser('spool', help='grade spool delivery against a flaky stand-in server')
+    spool.add_argument('--grades', type=int, default=500)
+    spool.add_argument('--failures', type=int, default=3)
+    spool.set_defaults(func=bench_spool)
+
+    submit = subparsers.add_parser('submit', help='QuizApp submit-to-results latency with a slow stand-in server')
+    submit.add_argument('--delay', type=float, default=2.0, help='stand-in server response delay in seconds')
+    submit.add_argument('--runs', type=int, default=5)
+    submit.set_defaults(func=bench_submit)
+
+    startup = subparsers.add_parser('startup', help='QuizApp cold start and start-to-question latency, headless')
+    startup.add_argument('--runs', type=int, default=10)
+    startup.set_defaults(func=bench_startup)
+
+    deadlines = subparsers.add_parser('deadlines', help='headless deadline enforcement through one scheduler')
+    deadlines.add_argument('--sessions', type=int, default=100000)
+    deadlines.set_defaults(func=bench_deadlines)
+
+    args = parser.parse_args()
+    args.func(args)
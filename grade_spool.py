@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import random
+import threading
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from quiz_engine import SERVER_URL
+
+SPOOL_PATH = os.environ.get('LEARNHUB_SPOOL', os.path.join(os.path.expanduser('~'), '.learnhub', 'grades.spool'))
+
+class ServerBusy(RuntimeError):
+    def __init__(self, status, retry_after=0):
+        super().__init__(f"server returned {status}")
+        self.retry_after = retry_after
+
+class GradeSpool:
+    """Durable outbox for quiz grades.
+
+    submit() appends the grade to a local spool file and returns at once.
+    A background thread posts pending grades to /submit_grades in batches
+    over a pooled HTTP session, backing off while the server is
+    unreachable. Acknowledged ids are appended to ``<path>.acked`` and both
+    files are truncated once nothing is pending, so grades survive a crash
+    or a server outage and are sent on the next start. Each grade carries
+    its spool id as client_id, so the server records a retried grade once;
+    a batch the server keeps failing with 5xx is set aside in
+    ``<path>.rejected`` after max_server_errors attempts.
+    """
+
+    def __init__(self, path=SPOOL_PATH, server_url=SERVER_URL, batch_size=50, timeout=5,
+                 min_backoff=0.5, max_backoff=60, max_server_errors=5):
+        self.path = path
+        self.acked_path = path + '.acked'
+        self.rejected_path = path + '.rejected'
+        self.url = server_url.rstrip('/') + '/submit_grades'
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.max_server_errors = max_server_errors
+        self.server_errors = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.sent = 0
+        self.callbacks = {}
+        self.http = requests.Session()
+        self.http.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.http.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.pending = self.load_pending()
+        self.thread = threading.Thread(target=self.run, name='grade-spool', daemon=True)
+        self.thread.start()
+
+    def load_pending(self):
+        acked = set()
+        if os.path.exists(self.acked_path):
+            with open(self.acked_path) as f:
+                acked = {line.strip() for line in f if line.strip()}
+        pending = []
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write
+                        continue
+                    if record['id'] not in acked:
+                        pending.append(record)
+        return pending
+
+    def submit(self, grade, token=None, callback=None):
+        # callback(status) runs on the sender thread once the server answers
+        record = {'id': uuid.uuid4().hex, 'token': token, 'grade': grade}
+        with self.lock:
+            if callback is not None:
+                self.callbacks[record['id']] = callback
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.pending.append(record)
+        self.wakeup.set()
+        return record['id']
+
+    def pending_count(self):
+        with self.lock:
+            return len(self.pending)
+
+    def run(self):
+        backoff = self.min_backoff
+        while True:
+            with self.lock:
+                batch = self.next_batch()
+            if not batch:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            try:
+                self.send(batch)
+                backoff = self.min_backoff
+            except (requests.RequestException, RuntimeError) as e:
+                # A shedding server says how long to stay away with Retry-After
+                delay = max(backoff * random.uniform(0.5, 1), getattr(e, 'retry_after', 0))
+                print(f"Grade upload failed, retrying in {delay:.1f}s: {e}", flush=True)
+                time.sleep(delay)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def next_batch(self):
+        # Grades are submitted on behalf of whoever the token names, so batches never mix tokens
+        if not self.pending:
+            return []
+        token = self.pending[0]['token']
+        return [record for record in self.pending if record['token'] == token][:self.batch_size]
+
+    def send(self, batch):
+        headers = {'Authorization': f"Bearer {batch[0]['token']}"} if batch[0]['token'] else {}
+        response = self.http.post(
+            self.url,
+            json={'grades': [dict(record['grade'], client_id=record['id']) for record in batch]},
+            headers=headers,
+            timeout=self.timeout,
+            allow_redirects=False
+        )
+        if response.status_code in (408, 429) or response.status_code >= 500 and not self.give_up(batch):
+            retry_after = response.headers.get('Retry-After', '')
+            raise ServerBusy(response.status_code, int(retry_after) if retry_after.isdigit() else 0)
+        if response.status_code != 200:
+            # Retrying will not help (e.g. an expired token, or a batch the server keeps failing); keep the grades for an administrator
+            with open(self.rejected_path, 'a') as f:
+                for record in batch:
+                    f.write(json.dumps(dict(record, status=response.status_code)) + '\n')
+        self.acknowledge(batch)
+        if response.status_code == 200:
+            self.sent += len(batch)
+        status = 'delivered' if response.status_code == 200 else 'rejected'
+        for record in batch:
+            callback = self.callbacks.pop(record['id'], None)
+            if callback is not None:
+                try:
+                    callback(status)
+                except Exception as e:
+                    # e.g. the quiz window has already been closed
+                    print(f"Grade status callback failed: {e}", flush=True)
+
+    def give_up(self, batch):
+        # Counts a server error against the batch; True once it should stop blocking the grades behind it
+        attempts = max(self.server_errors.get(record['id'], 0) for record in batch) + 1
+        for record in batch:
+            self.server_errors[record['id']] = attempts
+        return attempts >= self.max_server_errors
+
+    def acknowledge(self, batch):
+        ids = {record['id'] for record in batch}
+        for record_id in ids:
+            self.server_errors.pop(record_id, None)
+        with self.lock:
+            self.pending = [record for record in self.pending if record['id'] not in ids]
+            if self.pending:
+                with open(self.acked_path, 'a') as f:
+                    f.write(''.join(record_id + '\n' for record_id in ids))
+            else:
+                # Everything is delivered, so start both files afresh
+                open(self.path, 'w').close()
+                open(self.acked_path, 'w').close()
+
+spool = None
+spool_lock = threading.Lock()
+
+def get_spool():
+    # One spool and sender thread per process, shared by every quiz window
+    global spool
+    with spool_lock:
+        if spool is None:
+            spool = GradeSpool()
+    return spool
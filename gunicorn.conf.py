@@ -0,0 +1,23 @@
+import os
+import sys
+import multiprocessing
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# The live grade feed (/feed) holds a connection per proctor and is refused by sync
+# workers; serve it with GUNICORN_WORKER_CLASS=gevent
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+wsgi_app = 'app:warm_app()'
+
+# Import the app, its models and templates once in the master. gevent workers
+# monkey-patch threading after the fork, so their app must be imported after it;
+# the command line is checked too because -k overrides this file.
+preload_app = 'gevent' not in ' '.join([worker_class, os.environ.get('GUNICORN_CMD_ARGS', ''), *sys.argv])
+
+def post_fork(server, worker):
+    # Give each worker its own connection pool; close=False leaves the
+    # master's connections (if any) alone rather than closing them under it
+    if preload_app:
+        from app import app, db
+        with app.app_context():
+            db.engine.dispose(close=False)
@@ -1,13 +1,20 @@
-import sys
-import random
 import time
+
+# Reference point for the startup timings, taken before Qt is imported
+IMPORT_STARTED = time.perf_counter()
+
+import os
+import sys
 import ctypes
-from ctypes import wintypes, c_int, c_void_p, POINTER, WINFUNCTYPE, windll
+from ctypes import c_int, c_void_p, POINTER
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QPushButton, QLabel, QRadioButton, QButtonGroup, 
                            QMessageBox, QHBoxLayout, QFrame)
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QKeyEvent, QFont, QPalette, QColor
+from PySide6.QtCore import Qt, QTimer, Signal, QThreadPool
+from PySide6.QtGui import QKeyEvent
+from concurrent.futures import Future
+
+from quiz_engine import QuizSession, load_questions
 
 # Windows API constants and types
 WH_KEYBOARD_LL = 13
@@ -17,164 +24,152 @@ VK_LWIN = 0x5B
 VK_RWIN = 0x5C
 VK_D = 0x44
 
-# Define callback function type
-HOOKPROC = WINFUNCTYPE(c_int, c_int, c_int, POINTER(c_void_p))
+# Print startup timings when set
+QUIZ_PROFILE = bool(os.environ.get('QUIZ_PROFILE'))
 
-# Course-specific questions
-COURSE_QUESTIONS = {
-    "python": [
-        {
-            "question": "What is the output of print(type(1/2)) in Python?",
-            "options": ["<class 'int'>", "<class 'float'>", "<class 'number'>", "<class 'decimal'>"],
-            "correct": 1
-        },
-        {
-            "question": "Which of the following is NOT a Python data type?",
-            "options": ["List", "Dictionary", "Array", "Tuple"],
-            "correct": 2
-        },
-        {
-            "question": "What does the 'self' keyword represent in a Python class?",
-            "options": ["The class itself", "The instance of the class", "A static method", "A class method"],
-            "correct": 1
-        },
-        {
-            "question": "Which method is used to add an element to a list in Python?",
-            "options": ["add()", "insert()", "append()", "push()"],
-            "correct": 2
-        },
-        {
-            "question": "What is the correct way to create a virtual environment in Python?",
-            "options": ["python -m venv env", "python create venv", "python -v environment", "python setup venv"],
-            "correct": 0
-        }
-    ],
-    "database": [
-        {
-            "question": "What does SQL stand for?",
-            "options": ["Structured Query Language", "Simple Query Language", "Standard Query Language", "System Query Language"],
-            "correct": 0
-        },
-        {
-            "question": "Which SQL command is used to insert new data into a database?",
-            "options": ["ADD", "INSERT", "CREATE", "UPDATE"],
-            "correct": 1
-        },
-        {
-            "question": "What is a primary key in a database?",
-            "options": ["A key that opens the database", "A unique identifier for each record", "The first column in a table", "A backup key"],
-            "correct": 1
-        },
-        {
-            "question": "Which of the following is NOT a type of database relationship?",
-            "options": ["One-to-One", "One-to-Many", "Many-to-Many", "One-to-All"],
-            "correct": 3
-        },
-        {
-            "question": "What is normalization in database design?",
-            "options": ["Making the database faster", "Organizing data to reduce redundancy", "Backing up the database", "Creating indexes"],
-            "correct": 1
-        }
-    ],
-    "web": [
-        {
-            "question": "What does HTML stand for?",
-            "options": ["Hyper Text Markup Language", "High Tech Modern Language", "Hyper Transfer Markup Language", "Hyper Text Modern Language"],
-            "correct": 0
-        },
-        {
-            "question": "Which CSS property is used to change the text color?",
-            "options": ["text-color", "font-color", "color", "text-style"],
-            "correct": 2
-        },
-        {
-            "question": "What is the correct way to write a JavaScript array?",
-            "options": ["var colors = (1:'red', 2:'green', 3:'blue')", "var colors = ['red', 'green', 'blue']", "var colors = 'red', 'green', 'blue'", "var colors = {1:'red', 2:'green', 3:'blue'}"],
-            "correct": 1
-        },
-        {
-            "question": "Which HTML tag is used to create a hyperlink?",
-            "options": ["<link>", "<a>", "<href>", "<url>"],
-            "correct": 1
-        },
-        {
-            "question": "What is the purpose of the <meta> tag in HTML?",
-            "options": ["To create a new page", "To add metadata about the document", "To create a table", "To add a style"],
-            "correct": 1
-        }
-    ]
-}
+# One stylesheet for every quiz window, parsed once per QApplication
+THEME = """
+    QMainWindow {
+        background-color: #f0f2f5;
+    }
+    QLabel {
+        color: #1a1a1a;
+        font-size: 14px;
+    }
+    QPushButton {
+        background-color: #4a90e2;
+        color: white;
+        border: none;
+        padding: 8px 16px;
+        border-radius: 4px;
+        font-weight: bold;
+    }
+    QPushButton:hover {
+        background-color: #357abd;
+    }
+    QPushButton:disabled {
+        background-color: #cccccc;
+    }
+    QRadioButton {
+        spacing: 8px;
+        font-size: 16px;
+        padding: 8px;
+    }
+    QRadioButton::indicator {
+        width: 18px;
+        height: 18px;
+    }
+    QRadioButton::indicator:unchecked {
+        border: 2px solid #4a90e2;
+        border-radius: 9px;
+    }
+    QRadioButton::indicator:checked {
+        background-color: #4a90e2;
+        border: 2px solid #4a90e2;
+        border-radius: 9px;
+    }
+    QLabel#title {
+        font-size: 24px;
+        font-weight: bold;
+        margin-bottom: 20px;
+    }
+    QLabel#instructions {
+        font-size: 16px;
+        padding: 20px;
+        background-color: white;
+        border-radius: 8px;
+        border: 1px solid #e0e0e0;
+    }
+    QPushButton#startButton {
+        font-size: 18px;
+        padding: 12px 24px;
+        min-width: 200px;
+    }
+    QFrame#questionFrame {
+        background-color: white;
+        border-radius: 8px;
+        border: 1px solid #e0e0e0;
+        padding: 20px;
+    }
+    QLabel#question {
+        font-size: 18px;
+        font-weight: bold;
+    }
+    QPushButton#navButton {
+        min-width: 120px;
+    }
+    QLabel#timer {
+        font-size: 16px;
+        font-weight: bold;
+        color: #4a90e2;
+    }
+    QPushButton#submitButton {
+        min-width: 150px;
+        background-color: #2ecc71;
+    }
+"""
+
+def apply_theme():
+    app = QApplication.instance()
+    if not app.property("quizThemeApplied"):
+        app.setStyleSheet(THEME)
+        app.setProperty("quizThemeApplied", True)
+
+def windows_api():
+    # The lockdown calls only exist on Windows; elsewhere the window runs unlocked
+    if sys.platform != 'win32':
+        return None, None
+    return ctypes.WinDLL('user32', use_last_error=True), ctypes.WinDLL('kernel32', use_last_error=True)
 
 class QuizApp(QMainWindow):
-    def __init__(self, course="python"):
+    # Emitted the first time the window is painted
+    first_painted = Signal()
+    # Emitted the first time a question is rendered
+    first_question_shown = Signal()
+    # Emitted from the spool's threads as the grade moves towards the server
+    grade_status_changed = Signal(str)
+
+    def __init__(self, course="python", seed=None, token=None):
         super().__init__()
+        self.course = course
+        # Signed by the web app so this student's questions can be fetched and grades submitted
+        self.token = token
         self.setWindowTitle(f"{course.title()} Programming Quiz")
         self.setFixedSize(900, 700)
         
         # Initialize Windows API
-        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
-        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self.user32, self.kernel32 = windows_api()
         
         # Set up keyboard hook
         self.keyboard_hook = None
+        self.keyboard_callback = None
         
         # Set application style
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #f0f2f5;
-            }
-            QLabel {
-                color: #1a1a1a;
-                font-size: 14px;
-            }
-            QPushButton {
-                background-color: #4a90e2;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #357abd;
-            }
-            QPushButton:disabled {
-                background-color: #cccccc;
-            }
-            QRadioButton {
-                spacing: 8px;
-                font-size: 14px;
-            }
-            QRadioButton::indicator {
-                width: 18px;
-                height: 18px;
-            }
-            QRadioButton::indicator:unchecked {
-                border: 2px solid #4a90e2;
-                border-radius: 9px;
-            }
-            QRadioButton::indicator:checked {
-                background-color: #4a90e2;
-                border: 2px solid #4a90e2;
-                border-radius: 9px;
-            }
-        """)
-        
-        # Load course-specific questions
-        self.questions = COURSE_QUESTIONS.get(course.lower(), COURSE_QUESTIONS["python"])
-        
-        self.current_question = 0
-        self.score = 0
-        self.start_time = None
-        self.quiz_started = False
-        self.answers = [None] * len(self.questions)
-        
-        # Randomize questions
-        random.shuffle(self.questions)
+        apply_theme()
+        
+        # Startup timings in milliseconds
+        self.timings = {}
+        self.first_paint_reported = False
+        self.start_clicked_at = None
+        
+        # Fetch a random draw of course-specific questions on a pool thread while the
+        # instructions are read, so the request never holds up the first paint; the seed
+        # makes the draw reproducible
+        self.questions = Future()
+        QThreadPool.globalInstance().start(lambda: self.fetch_questions(seed, token))
+        
+        # Quiz state lives in the session; this window only renders it. Replaced by a
+        # session over the fetched questions when the quiz starts.
+        self.session = QuizSession(course, [])
+        self.first_question_reported = False
+        self.results_box = None
+        self.grade_status = None
+        self.grade_status_changed.connect(self.show_grade_status)
         
         self.init_ui()
         
     def init_ui(self):
+        # Only the instructions screen is built up front; see build_quiz_ui
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.layout = QVBoxLayout(self.central_widget)
@@ -183,13 +178,8 @@ class QuizApp(QMainWindow):
         
         # Title
         title_label = QLabel("General Knowledge Quiz")
+        title_label.setObjectName("title")
         title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        title_label.setStyleSheet("""
-            font-size: 24px;
-            font-weight: bold;
-            color: #1a1a1a;
-            margin-bottom: 20px;
-        """)
         self.layout.addWidget(title_label)
         
         # Instructions screen
@@ -203,59 +193,36 @@ class QuizApp(QMainWindow):
             "- No changes are allowed after submission\n\n"
             "Click 'Start Quiz' when you're ready!"
         )
+        self.instructions_label.setObjectName("instructions")
         self.instructions_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.instructions_label.setWordWrap(True)
-        self.instructions_label.setStyleSheet("""
-            font-size: 16px;
-            line-height: 1.5;
-            padding: 20px;
-            background-color: white;
-            border-radius: 8px;
-            border: 1px solid #e0e0e0;
-        """)
         self.layout.addWidget(self.instructions_label)
         
         # Start button
         self.start_button = QPushButton("Start Quiz")
-        self.start_button.setStyleSheet("""
-            font-size: 18px;
-            padding: 12px 24px;
-            min-width: 200px;
-        """)
+        self.start_button.setObjectName("startButton")
         self.start_button.clicked.connect(self.start_quiz)
         self.layout.addWidget(self.start_button, alignment=Qt.AlignmentFlag.AlignCenter)
         
-        # Quiz elements (initially hidden)
+    def build_quiz_ui(self):
+        # Quiz elements, built when the quiz starts rather than at launch
         self.question_frame = QFrame()
-        self.question_frame.setStyleSheet("""
-            background-color: white;
-            border-radius: 8px;
-            border: 1px solid #e0e0e0;
-            padding: 20px;
-        """)
+        self.question_frame.setObjectName("questionFrame")
         question_layout = QVBoxLayout(self.question_frame)
         question_layout.setSpacing(15)
         
         self.question_label = QLabel()
+        self.question_label.setObjectName("question")
         self.question_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.question_label.setWordWrap(True)
-        self.question_label.setStyleSheet("""
-            font-size: 18px;
-            font-weight: bold;
-            color: #1a1a1a;
-        """)
         question_layout.addWidget(self.question_label)
         
-        self.option_group = QButtonGroup()
+        self.option_group = QButtonGroup(self)
         self.option_buttons = []
         for i in range(4):
             option = QRadioButton()
             self.option_buttons.append(option)
             self.option_group.addButton(option, i)
-            option.setStyleSheet("""
-                font-size: 16px;
-                padding: 8px;
-            """)
             question_layout.addWidget(option)
         
         self.layout.addWidget(self.question_frame)
@@ -265,15 +232,11 @@ class QuizApp(QMainWindow):
         self.nav_layout.setSpacing(10)
         
         self.prev_button = QPushButton("Previous")
-        self.prev_button.setStyleSheet("""
-            min-width: 120px;
-        """)
+        self.prev_button.setObjectName("navButton")
         self.prev_button.clicked.connect(self.prev_question)
         
         self.next_button = QPushButton("Next")
-        self.next_button.setStyleSheet("""
-            min-width: 120px;
-        """)
+        self.next_button.setObjectName("navButton")
         self.next_button.clicked.connect(self.next_question)
         
         self.nav_layout.addWidget(self.prev_button)
@@ -284,47 +247,43 @@ class QuizApp(QMainWindow):
         bottom_layout = QHBoxLayout()
         
         self.timer_label = QLabel()
+        self.timer_label.setObjectName("timer")
         self.timer_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.timer_label.setStyleSheet("""
-            font-size: 16px;
-            font-weight: bold;
-            color: #4a90e2;
-        """)
         bottom_layout.addWidget(self.timer_label)
         
         self.submit_button = QPushButton("Submit Quiz")
-        self.submit_button.setStyleSheet("""
-            min-width: 150px;
-            background-color: #2ecc71;
-        """)
+        self.submit_button.setObjectName("submitButton")
         self.submit_button.clicked.connect(self.submit_quiz)
         bottom_layout.addWidget(self.submit_button)
         
         self.layout.addLayout(bottom_layout)
         
-        # Hide quiz elements initially
-        self.hide_quiz_elements()
-        
-    def hide_quiz_elements(self):
-        self.question_frame.hide()
-        self.timer_label.hide()
-        self.submit_button.hide()
-        self.prev_button.hide()
-        self.next_button.hide()
-        
-    def show_quiz_elements(self):
-        self.question_frame.show()
-        self.timer_label.show()
-        self.submit_button.show()
-        self.prev_button.show()
-        self.next_button.show()
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_reported:
+            self.first_paint_reported = True
+            self.record_timing('first_paint', IMPORT_STARTED)
+            self.first_painted.emit()
+            
+    def record_timing(self, name, since):
+        self.timings[name] = (time.perf_counter() - since) * 1000
+        if QUIZ_PROFILE:
+            print(f"{name}: {self.timings[name]:.1f}ms", flush=True)
         
+    def fetch_questions(self, seed, token):
+        try:
+            self.questions.set_result(load_questions(self.course, seed=seed, token=token))
+        except Exception as e:
+            self.questions.set_exception(e)
+            
     def start_quiz(self):
-        self.quiz_started = True
-        self.start_time = time.time()
+        self.start_clicked_at = time.perf_counter()
+        # Normally long done; otherwise wait out the fetch (it falls back to built-in questions)
+        self.session = QuizSession(self.course, self.questions.result())
+        self.session.start()
         self.instructions_label.hide()
         self.start_button.hide()
-        self.show_quiz_elements()
+        self.build_quiz_ui()
         
         # Set up keyboard hook when quiz starts
         self.setup_keyboard_hook()
@@ -337,78 +296,103 @@ class QuizApp(QMainWindow):
         )
         self.showFullScreen()
         
-        # Force window to stay on top
-        self.user32.SetWindowPos(
-            self.winId(),
-            -1,  # HWND_TOPMOST
-            0, 0, 0, 0,
-            0x0001 | 0x0002  # SWP_NOMOVE | SWP_NOSIZE
-        )
-        
-        # Disable task switching
-        self.user32.SystemParametersInfoW(0x101F, 0, None, 0)  # SPI_SETSCREENSAVERRUNNING
-        
-        # Start timer
-        self.timer = QTimer()
+        if self.user32:
+            # Force window to stay on top
+            self.user32.SetWindowPos(
+                self.winId(),
+                -1,  # HWND_TOPMOST
+                0, 0, 0, 0,
+                0x0001 | 0x0002  # SWP_NOMOVE | SWP_NOSIZE
+            )
+            
+            # Disable task switching
+            self.user32.SystemParametersInfoW(0x101F, 0, None, 0)  # SPI_SETSCREENSAVERRUNNING
+        
+        # Auto-submit with a single timer at the session's deadline
+        self.deadline_timer = QTimer(self)
+        self.deadline_timer.setSingleShot(True)
+        self.deadline_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.deadline_timer.timeout.connect(self.submit_quiz)
+        self.deadline_timer.start(int(self.session.time_left() * 1000))
+        
+        # Countdown display, woken only when the shown second changes
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.update_timer)
-        self.timer.start(1000)  # Update every second
+        self.update_timer()
         
         self.display_question()
         
     def update_timer(self):
-        if not self.quiz_started:
-            return
-            
-        elapsed = time.time() - self.start_time
-        remaining = max(600 - int(elapsed), 0)  # 10 minutes = 600 seconds
-        
-        if remaining == 0:
-            self.submit_quiz()
+        if not self.session.in_progress:
             return
             
+        remaining = self.session.remaining()
         minutes = remaining // 60
         seconds = remaining % 60
-        self.timer_label.setText(f"Time remaining: {minutes:02d}:{seconds:02d}")
+        text = f"Time remaining: {minutes:02d}:{seconds:02d}"
+        if text != self.timer_label.text():
+            self.timer_label.setText(text)
+            
+        # Sleep until the next whole second of elapsed time
+        elapsed = self.session.elapsed()
+        self.timer.start(int((1 - elapsed % 1) * 1000) + 1)
         
     def display_question(self):
-        if self.current_question < len(self.questions):
-            question = self.questions[self.current_question]
-            self.question_label.setText(f"Question {self.current_question + 1}: {question['question']}")
+        if self.session.current < len(self.session.questions):
+            question = self.session.question
+            self.question_label.setText(f"Question {self.session.current + 1}: {question['question']}")
             
-            for i, option in enumerate(question['options']):
-                self.option_buttons[i].setText(option)
-                self.option_buttons[i].setChecked(False)
+            # Clear the previous choice; an exclusive group will not uncheck its last button
+            checked_button = self.option_group.checkedButton()
+            if checked_button:
+                self.option_group.setExclusive(False)
+                checked_button.setChecked(False)
+                self.option_group.setExclusive(True)
+                
+            # Relabel the pre-built buttons, hiding any the question does not use
+            options = question['options']
+            for i, button in enumerate(self.option_buttons):
+                if i < len(options):
+                    button.setText(options[i])
+                button.setVisible(i < len(options))
                 
             # Restore previous answer if exists
-            if self.answers[self.current_question] is not None:
-                self.option_buttons[self.answers[self.current_question]].setChecked(True)
+            if self.session.answer is not None:
+                self.option_buttons[self.session.answer].setChecked(True)
                 
             # Update navigation buttons state
-            self.prev_button.setEnabled(self.current_question > 0)
-            self.next_button.setEnabled(self.current_question < len(self.questions) - 1)
+            self.prev_button.setEnabled(self.session.has_previous)
+            self.next_button.setEnabled(self.session.has_next)
             
-    def next_question(self):
-        # Save current answer
+            if not self.first_question_reported:
+                self.first_question_reported = True
+                self.record_timing('question_render', self.start_clicked_at)
+                self.first_question_shown.emit()
+            
+    def save_answer(self):
         checked_button = self.option_group.checkedButton()
         if checked_button:
-            self.answers[self.current_question] = self.option_group.id(checked_button)
-        
-        if self.current_question < len(self.questions) - 1:
-            self.current_question += 1
+            self.session.choose(self.option_group.id(checked_button))
+            
+    def next_question(self):
+        self.save_answer()
+        if self.session.next():
             self.display_question()
             
     def prev_question(self):
-        # Save current answer
-        checked_button = self.option_group.checkedButton()
-        if checked_button:
-            self.answers[self.current_question] = self.option_group.id(checked_button)
-            
-        if self.current_question > 0:
-            self.current_question -= 1
+        self.save_answer()
+        if self.session.previous():
             self.display_question()
             
     def setup_keyboard_hook(self):
         """Set up low-level keyboard hook to block Windows key and Windows+D"""
+        if not self.user32:
+            return
+            
+        # Define callback function type
+        HOOKPROC = ctypes.WINFUNCTYPE(c_int, c_int, c_int, POINTER(c_void_p))
+        
         def keyboard_callback(nCode, wParam, lParam):
             if nCode >= 0:
                 # Get the key code
@@ -438,10 +422,11 @@ class QuizApp(QMainWindow):
                             return 1
             return self.user32.CallNextHookEx(self.keyboard_hook, nCode, wParam, lParam)
         
-        # Create the hook
+        # Create the hook, keeping the callback alive for as long as it is installed
+        self.keyboard_callback = HOOKPROC(keyboard_callback)
         self.keyboard_hook = self.user32.SetWindowsHookExA(
             WH_KEYBOARD_LL,
-            HOOKPROC(keyboard_callback),
+            self.keyboard_callback,
             self.kernel32.GetModuleHandleW(None),
             0
         )
@@ -465,7 +450,7 @@ class QuizApp(QMainWindow):
         event.accept()
         
     def keyPressEvent(self, event: QKeyEvent):
-        if self.quiz_started:
+        if self.session.in_progress:
             # Block Alt+Tab, Windows key, Windows+D, and other window switching shortcuts
             if (event.key() in [Qt.Key.Key_Alt, Qt.Key.Key_Tab, Qt.Key.Key_Escape, 
                               Qt.Key.Key_Meta, Qt.Key.Key_Super_L, Qt.Key.Key_Super_R] or
@@ -479,49 +464,69 @@ class QuizApp(QMainWindow):
             super().keyPressEvent(event)
             
     def submit_quiz(self):
-        if not self.quiz_started:
+        if not self.session.in_progress:
             return
             
-        self.quiz_started = False
         self.timer.stop()
+        self.deadline_timer.stop()
         
-        # Save current answer
-        checked_button = self.option_group.checkedButton()
-        if checked_button:
-            self.answers[self.current_question] = self.option_group.id(checked_button)
-        
-        # Calculate score
-        self.score = 0
-        for i, question in enumerate(self.questions):
-            if self.answers[i] is not None and self.answers[i] == question['correct']:
-                self.score += 1
+        # Save current answer and calculate score
+        self.save_answer()
+        score = self.session.submit()
                 
         # Calculate time taken
-        time_taken = time.time() - self.start_time
+        time_taken = self.session.elapsed()
         minutes = int(time_taken) // 60
         seconds = int(time_taken) % 60
         
-        # Send grade to web application
-        try:
-            import requests
-            grade_data = {
-                'course': self.course,
-                'score': self.score,
-                'total_questions': len(self.questions)
-            }
-            requests.post('http://127.0.0.1:5000/submit_grade', json=grade_data)
-        except Exception as e:
-            print(f"Error submitting grade: {e}")
+        # Spool the grade on a worker thread so the results appear straight away
+        grade_data = {
+            'course': self.course,
+            'score': score,
+            'total_questions': len(self.session.questions),
+            'responses': self.session.responses()
+        }
+        QThreadPool.globalInstance().start(lambda: self.spool_grade(grade_data))
         
-        # Show results
-        QMessageBox.information(
-            self,
+        # Show results without blocking; the status line updates when the server answers
+        self.results_box = QMessageBox(
+            QMessageBox.Icon.Information,
             "Quiz Results",
             f"Quiz completed!\n\n"
-            f"Score: {self.score}/{len(self.questions)}\n"
-            f"Time taken: {minutes:02d}:{seconds:02d}"
+            f"Score: {score}/{len(self.session.questions)}\n"
+            f"Time taken: {minutes:02d}:{seconds:02d}",
+            parent=self
         )
+        self.results_box.setInformativeText("Grade status: saving...")
+        self.results_box.finished.connect(self.finish_quiz)
+        self.results_box.open()
         
+    def spool_grade(self, grade_data):
+        # Runs on a thread pool thread; signals hand the status back to the GUI thread
+        try:
+            # Imported here, like the question fetch, so the GUI thread never loads requests
+            from grade_spool import get_spool
+            get_spool().submit(grade_data, self.token, callback=self.grade_status_changed.emit)
+            self.grade_status_changed.emit('saved')
+        except Exception as e:
+            print(f"Error submitting grade: {e}")
+            self.grade_status_changed.emit('failed')
+            
+    def show_grade_status(self, status):
+        messages = {
+            'saved': "saved locally, sending to server...",
+            'delivered': "received by server",
+            'rejected': "rejected by server, kept locally",
+            'failed': "could not be saved"
+        }
+        # The server can answer before the worker reports the local save
+        if status == 'saved' and self.grade_status is not None:
+            return
+        self.grade_status = status
+        if self.results_box is not None:
+            self.results_box.setInformativeText(f"Grade status: {messages.get(status, status)}")
+            
+    def finish_quiz(self):
         # Exit fullscreen
         self.showNormal()
         
@@ -0,0 +1,340 @@
+import os
+import heapq
+import itertools
+import random
+import threading
+import time
+
+SERVER_URL = os.environ.get('LEARNHUB_URL', 'http://127.0.0.1:5000')
+QUESTIONS_PER_QUIZ = 10
+
+# Course-specific questions
+COURSE_QUESTIONS = {
+    "python": [
+        {
+            "question": "What is the output of print(type(1/2)) in Python?",
+            "options": ["<class 'int'>", "<class 'float'>", "<class 'number'>", "<class 'decimal'>"],
+            "correct": 1
+        },
+        {
+            "question": "Which of the following is NOT a Python data type?",
+            "options": ["List", "Dictionary", "Array", "Tuple"],
+            "correct": 2
+        },
+        {
+            "question": "What does the 'self' keyword represent in a Python class?",
+            "options": ["The class itself", "The instance of the class", "A static method", "A class method"],
+            "correct": 1
+        },
+        {
+            "question": "Which method is used to add an element to a list in Python?",
+            "options": ["add()", "insert()", "append()", "push()"],
+            "correct": 2
+        },
+        {
+            "question": "What is the correct way to create a virtual environment in Python?",
+            "options": ["python -m venv env", "python create venv", "python -v environment", "python setup venv"],
+            "correct": 0
+        }
+    ],
+    "database": [
+        {
+            "question": "What does SQL stand for?",
+            "options": ["Structured Query Language", "Simple Query Language", "Standard Query Language", "System Query Language"],
+            "correct": 0
+        },
+        {
+            "question": "Which SQL command is used to insert new data into a database?",
+            "options": ["ADD", "INSERT", "CREATE", "UPDATE"],
+            "correct": 1
+        },
+        {
+            "question": "What is a primary key in a database?",
+            "options": ["A key that opens the database", "A unique identifier for each record", "The first column in a table", "A backup key"],
+            "correct": 1
+        },
+        {
+            "question": "Which of the following is NOT a type of database relationship?",
+            "options": ["One-to-One", "One-to-Many", "Many-to-Many", "One-to-All"],
+            "correct": 3
+        },
+        {
+            "question": "What is normalization in database design?",
+            "options": ["Making the database faster", "Organizing data to reduce redundancy", "Backing up the database", "Creating indexes"],
+            "correct": 1
+        }
+    ],
+    "web": [
+        {
+            "question": "What does HTML stand for?",
+            "options": ["Hyper Text Markup Language", "High Tech Modern Language", "Hyper Transfer Markup Language", "Hyper Text Modern Language"],
+            "correct": 0
+        },
+        {
+            "question": "Which CSS property is used to change the text color?",
+            "options": ["text-color", "font-color", "color", "text-style"],
+            "correct": 2
+        },
+        {
+            "question": "What is the correct way to write a JavaScript array?",
+            "options": ["var colors = (1:'red', 2:'green', 3:'blue')", "var colors = ['red', 'green', 'blue']", "var colors = 'red', 'green', 'blue'", "var colors = {1:'red', 2:'green', 3:'blue'}"],
+            "correct": 1
+        },
+        {
+            "question": "Which HTML tag is used to create a hyperlink?",
+            "options": ["<link>", "<a>", "<href>", "<url>"],
+            "correct": 1
+        },
+        {
+            "question": "What is the purpose of the <meta> tag in HTML?",
+            "options": ["To create a new page", "To add metadata about the document", "To create a table", "To add a style"],
+            "correct": 1
+        }
+    ]
+}
+
+def quiz_rng(seed=None):
+    # String seeds are hashed deterministically, so "user:course:attempt" reproduces a draw
+    return random.Random(seed)
+
+def sample_indices(n, k, rng=random):
+    """Draw k distinct indices from range(n) in O(k) time and memory.
+
+    A Fisher-Yates shuffle that records only the swapped positions, so
+    the bank itself is never copied or reordered.
+    """
+    swapped = {}
+    drawn = []
+    for i in range(min(k, n)):
+        j = rng.randrange(i, n)
+        drawn.append(swapped.get(j, j))
+        swapped[j] = swapped.get(i, i)
+    return drawn
+
+def sample_ids(ids, k, rng=random):
+    return [ids[i] for i in sample_indices(len(ids), k, rng)]
+
+def stratified_sample(strata, k, rng=random):
+    """Draw k ids spread over strata in proportion to their sizes.
+
+    ``strata`` maps a key such as (topic, difficulty) to a sequence of
+    ids. Quotas use largest remainders, and the draw is returned in
+    random order.
+    """
+    keys = sorted(strata, key=str)
+    total = sum(len(strata[key]) for key in keys)
+    k = min(k, total)
+    if not k:
+        return []
+    quotas = {key: k * len(strata[key]) // total for key in keys}
+    by_remainder = sorted(keys, key=lambda key: (k * len(strata[key]) % total), reverse=True)
+    for key in by_remainder[:k - sum(quotas.values())]:
+        quotas[key] += 1
+    drawn = []
+    for key in keys:
+        drawn.extend(sample_ids(strata[key], quotas[key], rng))
+    return [drawn[i] for i in sample_indices(len(drawn), len(drawn), rng)]
+
+def load_questions(course, count=QUESTIONS_PER_QUIZ, seed=None, token=None):
+    # Sampled from the server's question bank, falling back to the built-in questions
+    try:
+        import requests
+        params = {'count': count}
+        if seed is not None:
+            params['seed'] = seed
+        headers = {'Authorization': f"Bearer {token}"} if token else {}
+        response = requests.get(f"{SERVER_URL}/questions/{course}", params=params, headers=headers, timeout=3)
+        response.raise_for_status()
+        questions = response.json()['questions']
+        if questions:
+            return questions
+    except Exception as e:
+        print(f"Using built-in questions: {e}")
+    bank = COURSE_QUESTIONS.get(course.lower(), COURSE_QUESTIONS["python"])
+    return [bank[i] for i in sample_indices(len(bank), count, quiz_rng(seed))]
+
+class QuizSession:
+    """Questions, answers, timing and scoring for one quiz attempt.
+
+    Pure Python so it can run without a display: QuizApp is a view over
+    one session, and the server or a benchmark can hold many at once.
+    Times come from time.monotonic(), so clock adjustments cannot shorten
+    or extend a quiz; methods that depend on time take an optional
+    ``now`` in the same clock.
+    """
+
+    __slots__ = ('course', 'questions', 'answers', 'current', 'duration',
+                 'started_at', 'finished_at', 'score', 'time_spent', 'viewed_at')
+
+    def __init__(self, course, questions, duration=600):
+        self.course = course
+        self.questions = questions
+        self.answers = [None] * len(questions)
+        self.current = 0
+        self.duration = duration
+        self.started_at = None
+        self.finished_at = None
+        self.score = 0
+        # Seconds spent looking at each question, split on every navigation
+        self.time_spent = [0.0] * len(questions)
+        self.viewed_at = None
+
+    @property
+    def in_progress(self):
+        return self.started_at is not None and self.finished_at is None
+
+    @property
+    def question(self):
+        return self.questions[self.current]
+
+    @property
+    def answer(self):
+        return self.answers[self.current]
+
+    @property
+    def has_previous(self):
+        return self.current > 0
+
+    @property
+    def has_next(self):
+        return self.current < len(self.questions) - 1
+
+    def start(self, now=None):
+        self.started_at = time.monotonic() if now is None else now
+        self.viewed_at = self.started_at
+
+    def choose(self, option):
+        self.answers[self.current] = option
+
+    def leave_question(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.viewed_at is not None:
+            self.time_spent[self.current] += now - self.viewed_at
+        self.viewed_at = now
+
+    def next(self, now=None):
+        if self.has_next:
+            self.leave_question(now)
+            self.current += 1
+            return True
+        return False
+
+    def previous(self, now=None):
+        if self.has_previous:
+            self.leave_question(now)
+            self.current -= 1
+            return True
+        return False
+
+    @property
+    def deadline(self):
+        return self.started_at + self.duration
+
+    def elapsed(self, now=None):
+        if self.finished_at is not None:
+            end = self.finished_at
+        else:
+            end = time.monotonic() if now is None else now
+        return end - self.started_at
+
+    def time_left(self, now=None):
+        return max(self.duration - self.elapsed(now), 0)
+
+    def remaining(self, now=None):
+        return max(self.duration - int(self.elapsed(now)), 0)
+
+    def submit(self, now=None):
+        # Score the attempt once; later calls return the stored score
+        if not self.in_progress:
+            return self.score
+        self.finished_at = time.monotonic() if now is None else now
+        self.leave_question(self.finished_at)
+        self.viewed_at = None
+        self.score = sum(
+            1 for question, answer in zip(self.questions, self.answers)
+            if answer is not None and answer == question['correct']
+        )
+        return self.score
+
+    def responses(self):
+        # One record per answered or skipped question; built-in questions have no id and are left out
+        return [
+            {
+                'question_id': question['id'],
+                'chosen': answer,
+                'correct': answer is not None and answer == question['correct'],
+                'time_ms': int(seconds * 1000)
+            }
+            for question, answer, seconds in zip(self.questions, self.answers, self.time_spent)
+            if question.get('id') is not None
+        ]
+
+class DeadlineScheduler:
+    """Runs callbacks at monotonic deadlines from a single heap.
+
+    One scheduler can enforce the time limit of thousands of headless
+    sessions: add() is O(log n), cancelled entries are skipped lazily,
+    and run_due() only touches entries whose deadline has passed. Call
+    run_due() from your own loop, or start() a background thread.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def add(self, deadline, callback):
+        with self.condition:
+            # A list so cancel() can clear the callback in place; the unique counter keeps heap
+            # comparisons from ever reaching it
+            entry = [deadline, next(self.counter), callback]
+            heapq.heappush(self.heap, entry)
+            # Wake the background thread in case this is the new earliest deadline
+            self.condition.notify()
+        return entry
+
+    def add_session(self, session):
+        # Auto-submit the session when its time runs out
+        return self.add(session.deadline, lambda deadline: session.submit(now=deadline))
+
+    def cancel(self, entry):
+        # Nothing is kept for entries that have already fired
+        with self.condition:
+            entry[2] = None
+
+    def next_deadline(self):
+        with self.condition:
+            self.drop_cancelled()
+            return self.heap[0][0] if self.heap else None
+
+    def drop_cancelled(self):
+        while self.heap and self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+
+    def run_due(self, now=None):
+        now = time.monotonic() if now is None else now
+        due = []
+        with self.condition:
+            self.drop_cancelled()
+            while self.heap and self.heap[0][0] <= now:
+                due.append(heapq.heappop(self.heap))
+                self.drop_cancelled()
+        for deadline, _, callback in due:
+            if callback is not None:
+                callback(deadline)
+        return len(due)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run_forever, name='deadline-scheduler', daemon=True)
+        self.thread.start()
+
+    def run_forever(self):
+        while True:
+            with self.condition:
+                self.drop_cancelled()
+                wait = self.heap[0][0] - time.monotonic() if self.heap else None
+                if wait is None or wait > 0:
+                    self.condition.wait(wait)
+                    continue
+            self.run_due()
@@ -0,0 +1,68 @@
+import sys
+import os
+import json
+import time
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt
+from PySide6.QtNetwork import QTcpServer, QHostAddress
+
+from quiz_app import QuizApp
+
+QUIZ_HOST_PORT = int(os.environ.get('QUIZ_HOST_PORT', 5055))
+
+class QuizHost:
+    """Long-lived process that opens quiz windows on request.
+
+    The web app sends one JSON line per launch over a local TCP
+    connection, e.g.
+    {"course": "python", "seed": "7:python:3", "token": "...", "requested_at": 1700000000.0}.
+    PySide6 and the question bank are loaded once, so a launch only costs
+    building a new QuizApp window.
+    """
+
+    def __init__(self, port=QUIZ_HOST_PORT):
+        self.windows = []
+        self.latencies = []
+        self.server = QTcpServer()
+        self.server.newConnection.connect(self.accept_connections)
+        if not self.server.listen(QHostAddress.LocalHost, port):
+            raise RuntimeError(f'Quiz host could not listen on port {port}: {self.server.errorString()}')
+
+    def accept_connections(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.readyRead.connect(lambda connection=connection: self.read_requests(connection))
+            connection.disconnected.connect(connection.deleteLater)
+
+    def read_requests(self, connection):
+        while connection.canReadLine():
+            line = bytes(connection.readLine()).decode().strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+                self.launch(message['course'], message.get('seed'), message.get('token'),
+                            message.get('requested_at', time.time()))
+            except (ValueError, KeyError) as e:
+                print(f"Ignoring bad launch request {line!r}: {e}", flush=True)
+
+    def launch(self, course, seed, token, requested_at):
+        window = QuizApp(course, seed, token)
+        window.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        window.destroyed.connect(lambda: self.windows.remove(window))
+        window.first_painted.connect(lambda: self.record(course, 'window', requested_at))
+        window.first_question_shown.connect(lambda: self.record(course, 'first_question', requested_at))
+        self.windows.append(window)
+        window.show()
+
+    def record(self, course, stage, requested_at):
+        latency = time.time() - requested_at
+        self.latencies.append((course, stage, latency))
+        print(f"{course} launch to {stage}: {latency * 1000:.1f}ms", flush=True)
+
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    # Keep running with no quiz windows open
+    app.setQuitOnLastWindowClosed(False)
+    host = QuizHost()
+    sys.exit(app.exec())
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import time, so point it at throwaway storage first
+scratch = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(scratch, 'test.db'))
+os.environ.setdefault('ARCHIVE_DIR', os.path.join(scratch, 'archive'))
+os.environ.setdefault('ADMISSION_CONTROL', '0')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('SECRET_KEY', 'test')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, db, init_db
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.drop_all()
+        init_db()
+        yield flask_app
+        db.session.remove()
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from app import GradeFeed, QuizGrade, User, db
+
+
+def add_grades(user, count):
+    for _ in range(count):
+        db.session.add(QuizGrade(user_id=user.id, course='python', score=1, total_questions=5,
+                                 date_taken=datetime.utcnow()))
+    db.session.commit()
+
+
+def test_a_new_subscriber_is_not_replayed_grades_from_while_nobody_watched(app):
+    app.config['FEED_POLL_INTERVAL'] = 0.01
+    student = User(username='student', password_hash='x')
+    db.session.add(student)
+    db.session.flush()
+    add_grades(student, 3)
+    feed = GradeFeed(app)
+    first = feed.subscribe()
+    assert first.start_id == 3
+    feed.unsubscribe(first)
+    add_grades(student, 250)
+    second = feed.subscribe()
+    assert second.start_id == 253
+    feed.notify()
+    assert second.take(0.2) == ([], 0)
+    add_grades(student, 2)
+    feed.notify()
+    events, dropped = second.take(1)
+    assert [event['id'] for event in events] == [254, 255]
+    assert dropped == 0
+    feed.unsubscribe(second)
@@ -0,0 +1,51 @@
+from concurrent.futures import Future
+
+from app import GradeWriter, QuizGrade, ScoreBucket, User, build_grade, db, record_grade, unrecorded
+
+
+def grade(user_id, client_id, score=3):
+    return {'user_id': user_id, 'course': 'python', 'score': score, 'total_questions': 5,
+            'date_taken': None, 'client_id': client_id, 'responses': []}
+
+
+def add_users(*names):
+    users = [User(username=name, password_hash='x') for name in names]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+def flush(app, *grades):
+    futures = [Future() for _ in grades]
+    GradeWriter(app)._flush(list(zip(grades, futures)))
+    return [future.result(timeout=0) for future in futures]
+
+
+def test_client_ids_are_unique_per_student(app):
+    first, second = add_users('first', 'second')
+    flush(app, grade(first, 'attempt-1'))
+    assert unrecorded([grade(first, 'attempt-1')]) == []
+    assert unrecorded([grade(second, 'attempt-1')]) == [grade(second, 'attempt-1')]
+    flush(app, grade(second, 'attempt-1'))
+    assert QuizGrade.query.filter_by(client_id='attempt-1').count() == 2
+
+
+def test_unrecorded_drops_repeats_within_a_batch(app):
+    student, = add_users('student')
+    grades = [grade(student, 'a'), grade(student, 'a', score=4), grade(student, None), grade(student, None)]
+    assert unrecorded(grades) == [grades[0], grades[2], grades[3]]
+
+
+def test_a_retry_queued_with_its_original_succeeds_once(app):
+    student, = add_users('student')
+    assert flush(app, grade(student, 'a'), grade(student, 'b'), grade(student, 'a')) == [None, None, None]
+    assert sorted(grade.client_id for grade in QuizGrade.query) == ['a', 'b']
+
+
+def test_score_buckets_count_each_attempt(app):
+    first, second = add_users('first', 'second')
+    for user_id, score in ((first, 3), (second, 3), (first, 4)):
+        record_grade(build_grade(grade(user_id, None, score)))
+    db.session.commit()
+    buckets = {(bucket.course, bucket.percentage): bucket.attempts for bucket in ScoreBucket.query}
+    assert buckets == {('python', 60): 2, ('python', 80): 1}
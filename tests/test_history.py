@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from app import (CourseSummary, QuizGrade, ScoreBucket, User, archive_term, db, decode_cursor, encode_cursor,
+                 history_page, iter_archived_history, rebuild_course_summaries, rebuild_score_buckets, record_grade)
+
+
+@pytest.mark.parametrize('value', ['', 'nonsense', '2024-01-01T00:00:00', 'yesterday_3', '2024-01-01T00:00:00_x'])
+def test_decode_cursor_rejects_malformed_values(app, value):
+    with pytest.raises(BadRequest):
+        decode_cursor(value)
+
+
+def test_cursor_round_trips(app):
+    grade = QuizGrade(id=42, date_taken=datetime(2024, 3, 1, 12, 30, 5, 123))
+    assert decode_cursor(encode_cursor(grade)) == (datetime(2024, 3, 1, 12, 30, 5, 123), 42)
+
+
+@pytest.fixture
+def history(app, tmp_path):
+    app.config['ARCHIVE_DIR'] = str(tmp_path)
+    student, other = User(username='student', password_hash='x'), User(username='other', password_hash='x')
+    db.session.add_all([student, other])
+    db.session.flush()
+    dates = [
+        datetime(2020, 2, 1), datetime(2020, 3, 1), datetime(2020, 3, 1),
+        datetime(2020, 8, 1), datetime(2020, 9, 1),
+        datetime(2021, 2, 1), datetime(2021, 2, 1), datetime(2021, 3, 1),
+    ]
+    for score, date_taken in enumerate(dates):
+        record_grade(QuizGrade(user_id=student.id, course='python', score=score, total_questions=10,
+                               date_taken=date_taken))
+    record_grade(QuizGrade(user_id=other.id, course='python', score=9, total_questions=10,
+                           date_taken=datetime(2020, 3, 1)))
+    record_grade(QuizGrade(user_id=student.id, course='web', score=9, total_questions=10,
+                           date_taken=datetime(2020, 9, 1)))
+    db.session.commit()
+    assert archive_term('2020-1') == 4
+    assert archive_term('2020-2') == 3
+    return student.id
+
+
+def walk(user_id, page_size):
+    pages, cursor = [], None
+    while True:
+        grades, next_cursor = history_page(user_id, 'python', cursor, page_size)
+        pages.append([grade.score for grade in grades])
+        if next_cursor is None:
+            return pages
+        cursor = decode_cursor(next_cursor)
+
+
+def test_paging_crosses_from_live_grades_into_archives(history):
+    assert QuizGrade.query.filter_by(user_id=history).count() == 3
+    # Newest first, ties on date_taken broken by id
+    assert walk(history, 2) == [[7, 6], [5, 4], [3, 2], [1, 0]]
+    assert walk(history, 3) == [[7, 6, 5], [4, 3, 2], [1, 0]]
+    assert walk(history, 10) == [[7, 6, 5, 4, 3, 2, 1, 0]]
+
+
+def test_paging_from_a_cursor_inside_the_archive(history):
+    grades, next_cursor = history_page(history, 'python', (datetime(2020, 3, 1), 10 ** 6), 2)
+    assert [grade.score for grade in grades] == [2, 1]
+    assert next_cursor is not None
+    grades, next_cursor = history_page(history, 'python', decode_cursor(next_cursor), 2)
+    assert [grade.score for grade in grades] == [0]
+    assert next_cursor is None
+
+
+def test_archived_history_is_streamed_newest_first(history):
+    assert [grade.score for grade in iter_archived_history(history, 'python')] == [4, 3, 2, 1, 0]
+
+
+def test_rebuilding_summaries_counts_archived_attempts(history):
+    # Recorded incrementally before the grades were archived
+    before = {(summary.user_id, summary.course): summary_row(summary) for summary in CourseSummary.query}
+    buckets = {(bucket.course, bucket.percentage): bucket.attempts for bucket in ScoreBucket.query}
+    rebuild_course_summaries(batch_size=1)
+    rebuild_score_buckets()
+    assert {(summary.user_id, summary.course): summary_row(summary) for summary in CourseSummary.query} == before
+    assert {(bucket.course, bucket.percentage): bucket.attempts for bucket in ScoreBucket.query} == buckets
+    summary = db.session.get(CourseSummary, (history, 'python'))
+    assert (summary.attempts, summary.best_score, summary.latest_score) == (8, 7, 7)
+    assert summary.average_percentage == pytest.approx(35.0)
+
+
+def summary_row(summary):
+    return (summary.attempts, summary.best_score, summary.latest_score, summary.latest_total_questions,
+            round(summary.average_percentage, 6), summary.last_taken)
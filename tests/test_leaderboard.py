@@ -0,0 +1,87 @@
+import pytest
+
+from app import Leaderboard, leaderboards, question_cache
+
+
+def board(*rows):
+    return Leaderboard(rows, watermark=None)
+
+
+def test_page_orders_by_score_then_user_id():
+    leaderboard = board((3, 5), (1, 9), (2, 5))
+    students, rows = leaderboard.page(0, 10)
+    assert students == 3
+    assert rows == [(1, 1, 9), (2, 2, 5), (2, 3, 5)]
+
+
+def test_page_offset_and_limit():
+    leaderboard = board(*[(user_id, user_id) for user_id in range(1, 11)])
+    students, rows = leaderboard.page(2, 3)
+    assert students == 10
+    assert rows == [(3, 8, 8), (4, 7, 7), (5, 6, 6)]
+    assert leaderboard.page(20, 5) == (10, [])
+
+
+def test_ties_share_a_rank():
+    leaderboard = board((1, 7), (2, 7), (3, 4))
+    assert leaderboard.standing(1)['rank'] == 1
+    assert leaderboard.standing(2)['rank'] == 1
+    assert leaderboard.standing(3)['rank'] == 3
+
+
+def test_percentile_counts_only_lower_scores():
+    leaderboard = board((1, 10), (2, 7), (3, 7), (4, 1))
+    assert leaderboard.standing(1)['percentile'] == 100.0
+    # Only one of the three others scores lower than 7
+    assert leaderboard.standing(2)['percentile'] == pytest.approx(100 / 3)
+    assert leaderboard.standing(4)['percentile'] == 0.0
+    assert board((1, 3)).standing(1)['percentile'] == 100.0
+
+
+def test_update_moves_a_score_up_and_down():
+    leaderboard = board((1, 5), (2, 6), (3, 7))
+    leaderboard.update(1, 9)
+    assert leaderboard.standing(1) == {'rank': 1, 'score': 9, 'students': 3, 'percentile': 100.0}
+    leaderboard.update(1, 2)
+    assert leaderboard.standing(1)['rank'] == 3
+    assert leaderboard.page(0, 10)[1] == [(1, 3, 7), (2, 2, 6), (3, 1, 2)]
+    assert len(leaderboard.entries) == 3
+
+
+def test_update_with_the_same_score_is_a_no_op():
+    leaderboard = board((1, 5))
+    leaderboard.update(1, 5)
+    assert list(leaderboard.entries) == [Leaderboard.pack(5, 1)]
+
+
+def test_user_beyond_known_ids():
+    leaderboard = board((1, 5))
+    assert leaderboard.get_best(1000) == -1
+    assert leaderboard.standing(1000) is None
+    leaderboard.update(1000, 6)
+    assert leaderboard.standing(1000)['rank'] == 1
+    assert leaderboard.standing(1)['rank'] == 2
+    assert leaderboard.get_best(999) == -1
+
+
+def test_zero_is_a_real_score():
+    leaderboard = board((1, 0))
+    assert leaderboard.standing(1) == {'rank': 1, 'score': 0, 'students': 1, 'percentile': 100.0}
+
+
+def test_pack_round_trips():
+    assert Leaderboard.unpack(Leaderboard.pack(42, 123456)) == (42, 123456)
+
+
+def test_unknown_courses_are_not_loaded(app):
+    client = app.test_client()
+    client.post('/register', data={'username': 'student', 'password': 'secret'})
+    client.post('/login', data={'username': 'student', 'password': 'secret'})
+    for course in ('nonsense', 'x' * 20):
+        assert client.get(f'/leaderboard/{course}').status_code == 404
+        assert client.get(f'/leaderboard/{course}/me').status_code == 404
+        assert client.get(f'/questions/{course}').status_code == 404
+    assert client.get('/leaderboard/python').status_code == 200
+    assert client.get('/questions/python').status_code == 200
+    assert 'nonsense' not in leaderboards.boards
+    assert 'nonsense' not in question_cache.ids
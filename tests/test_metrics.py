@@ -0,0 +1,14 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import db, request_metrics
+
+
+def test_failed_statements_are_timed_and_counted(app):
+    queries = request_metrics.background_queries
+    with db.engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(db.text('SELECT * FROM no_such_table'))
+        connection.execute(db.text('SELECT 1'))
+        assert connection.info['query_started'] == []
+    assert request_metrics.background_queries == queries + 2
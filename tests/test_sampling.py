@@ -0,0 +1,62 @@
+from collections import Counter
+
+from quiz_engine import quiz_rng, sample_ids, sample_indices, stratified_sample
+
+
+def test_sample_indices_draws_distinct_indices_in_range():
+    for seed in range(50):
+        drawn = sample_indices(20, 7, quiz_rng(seed))
+        assert len(drawn) == 7
+        assert len(set(drawn)) == 7
+        assert all(0 <= i < 20 for i in drawn)
+
+
+def test_sample_indices_caps_at_n():
+    assert sorted(sample_indices(5, 10, quiz_rng(1))) == [0, 1, 2, 3, 4]
+    assert sample_indices(0, 3, quiz_rng(1)) == []
+    assert sample_indices(5, 0, quiz_rng(1)) == []
+
+
+def test_sample_indices_is_roughly_uniform():
+    rng = quiz_rng(7)
+    counts = Counter(i for _ in range(3000) for i in sample_indices(10, 3, rng))
+    # Each index is expected 900 times
+    assert all(800 < counts[i] < 1000 for i in range(10))
+
+
+def test_seed_reproduces_a_draw():
+    ids = list(range(100, 200))
+    assert sample_ids(ids, 10, quiz_rng('7:python:1')) == sample_ids(ids, 10, quiz_rng('7:python:1'))
+    assert sample_ids(ids, 10, quiz_rng('7:python:1')) != sample_ids(ids, 10, quiz_rng('7:python:2'))
+
+
+def test_stratified_sample_quotas_follow_strata_sizes():
+    strata = {
+        ('loops', 'easy'): list(range(0, 50)),
+        ('loops', 'hard'): list(range(50, 80)),
+        ('types', 'easy'): list(range(80, 100)),
+    }
+    drawn = stratified_sample(strata, 10, quiz_rng(3))
+    assert len(drawn) == len(set(drawn)) == 10
+    per_stratum = Counter(key for key, ids in strata.items() for i in drawn if i in ids)
+    assert per_stratum == {('loops', 'easy'): 5, ('loops', 'hard'): 3, ('types', 'easy'): 2}
+
+
+def test_stratified_sample_hands_out_remainders():
+    strata = {'a': [1, 2], 'b': [3, 4], 'c': [5, 6]}
+    drawn = stratified_sample(strata, 4, quiz_rng(0))
+    assert len(drawn) == len(set(drawn)) == 4
+    per_stratum = Counter(key for key, ids in strata.items() for i in drawn if i in ids)
+    assert sorted(per_stratum.values()) == [1, 1, 2]
+
+
+def test_stratified_sample_caps_at_total():
+    strata = {'a': [1], 'b': [2, 3]}
+    assert sorted(stratified_sample(strata, 10, quiz_rng(0))) == [1, 2, 3]
+    assert stratified_sample({}, 5, quiz_rng(0)) == []
+
+
+def test_stratified_sample_is_reproducible():
+    strata = {('x', 1): list(range(30)), ('y', 2): list(range(30, 45))}
+    first = stratified_sample(strata, 9, quiz_rng('3:python:1'))
+    assert first == stratified_sample(dict(reversed(list(strata.items()))), 9, quiz_rng('3:python:1'))